@@ -1,10 +1,18 @@
 import pandas as pd
 import json
-from collections import defaultdict
+import hashlib
+import pickle
+import shutil
 import os
 import re
 import numpy as np
 import logging
+import html
+
+try:
+    import orjson
+except ImportError:  # Fall back to the standard library encoder
+    orjson = None
 
 # Configure logging
 logging.basicConfig(
@@ -14,6 +22,207 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Numeric columns converted to integers for each structured data key
+INTEGER_FIELDS = {
+    'course_characteristics': ['Number of sections', 'Minimum section size', 'Target section size', 'Maximum section size', 'Length', 'Priority'],
+    'course_listings': ['Lecturer ID', 'Section number', 'Length', 'Start Term'],
+    'student_requests': ['student ID', 'Priority'],
+    'rooms': ['Room Number', 'Capacity']
+}
+
+# Low-cardinality columns stored as category dtype for faster grouping
+CATEGORY_FIELDS = {
+    'course_characteristics': ['Course code'],
+    'course_listings': ['Lecturer ID'],
+    'student_requests': ['Type', 'College Year', 'Course code']
+}
+
+# Columns holding comma-separated block lists
+BLOCK_LIST_FIELDS = {
+    'course_characteristics': ['Available blocks', 'Unavailable blocks']
+}
+
+def coerce_integer_columns(sheet_data, fields):
+    """
+    Convert numeric columns to integers in place, one column at a time.
+    
+    Cells that cannot be parsed as numbers (e.g. "Core course" in a Priority
+    column) are kept as is, matching a per-cell int() with a fallback.
+    
+    Args:
+        sheet_data (DataFrame): Sheet data to modify
+        fields (list): Column names to convert
+    """
+    for field in fields:
+        if field not in sheet_data.columns:
+            continue
+        numeric = pd.to_numeric(sheet_data[field], errors='coerce')
+        convertible = numeric.notna()
+        if convertible.sum() == sheet_data[field].notna().sum():
+            sheet_data[field] = np.trunc(numeric).astype('Int64')
+        elif convertible.any():
+            column = sheet_data[field].astype(object)
+            column[convertible] = np.trunc(numeric[convertible]).astype('int64')
+            sheet_data[field] = column
+
+def split_block_columns(sheet_data, fields):
+    """
+    Split comma-separated block strings (e.g. "1A, 1B") into lists in place.
+    
+    Args:
+        sheet_data (DataFrame): Sheet data to modify
+        fields (list): Column names to split
+    """
+    for field in fields:
+        if field not in sheet_data.columns:
+            continue
+        column = sheet_data[field]
+        present = column.notna()
+        # Only cast the non-null cells; astype(str) can rewrite NaN in place on
+        # object columns restored from the sheet cache
+        sheet_data[field] = column.where(~present, column[present].astype(str).str.split(', '))
+
+def to_records(sheet_data):
+    """
+    Convert a cleaned sheet to a list of row dictionaries.
+    
+    NaN cells are replaced with None in a single pass over the frame so the
+    records serialize to JSON directly.
+    
+    Args:
+        sheet_data (DataFrame): Sheet data after all dtype coercions
+        
+    Returns:
+        list: One dictionary per row
+    """
+    return sheet_data.astype(object).where(sheet_data.notna(), None).to_dict(orient='records')
+
+def json_default(value):
+    """
+    Serialize numpy and pandas scalars that the JSON encoders do not handle.
+    
+    Args:
+        value: Object the encoder could not serialize
+        
+    Returns:
+        A JSON-compatible int, float or str
+    """
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        return float(value)
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    return str(value)
+
+# Number of sheet rows converted to dictionaries at a time when saving
+JSON_CHUNK_ROWS = 10000
+
+def dump_json(value):
+    """Encode a single value as compact JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(value, default=json_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(value, default=json_default, separators=(',', ':')).encode()
+
+def save_structured_data(structured_data, file_path='cleaned_data.json'):
+    """
+    Write structured data to JSON one sheet at a time.
+
+    Sheet frames are converted to row dictionaries in chunks of
+    JSON_CHUNK_ROWS and written record by record, so the full JSON
+    document is never held in memory.
+
+    Args:
+        structured_data (dict): Sheet frames and plain values by key
+        file_path (str): Output JSON path
+    """
+    with open(file_path, 'wb') as f:
+        f.write(b'{')
+        for i, (key, value) in enumerate(structured_data.items()):
+            if i:
+                f.write(b',')
+            f.write(dump_json(key) + b':')
+            if not isinstance(value, pd.DataFrame):
+                f.write(dump_json(value))
+                continue
+            f.write(b'[')
+            for start in range(0, len(value), JSON_CHUNK_ROWS):
+                records = to_records(value.iloc[start:start + JSON_CHUNK_ROWS])
+                if start:
+                    f.write(b',')
+                f.write(b','.join(dump_json(record) for record in records))
+                del records
+            f.write(b']')
+        f.write(b'}')
+
+# Directory next to the workbook for memoized sheet reads, keyed by workbook
+# mtime, size, path and read schema
+CACHE_DIR = '.cache'
+
+def read_sheets(file_path, sheet_dtypes):
+    """
+    Read the requested sheets, memoizing them as pickles on first load.
+    
+    Sheets are cached in .cache/<mtime>_<size>_<digest>/ next to the workbook,
+    where the digest covers the resolved workbook path and sheet_dtypes, so
+    later runs against an unchanged workbook and schema skip the Excel parse.
+    Entries for older versions of the same workbook are removed when a new one
+    is written, and an unreadable entry is ignored and rebuilt. Pickle is used
+    rather than Parquet because it preserves mixed-type object columns exactly
+    and needs no extra dependency; since pickles are loaded from it, the cache
+    directory must be trusted.
+    
+    Args:
+        file_path (str): Path to the Excel file
+        sheet_dtypes (dict): Sheet name -> dtype mapping passed to pd.read_excel
+        
+    Returns:
+        tuple: (sheet_names, sheets) with all sheet names in the workbook and a
+            dict of DataFrames for the requested sheets that are present
+    """
+    stat = os.stat(file_path)
+    real_path = os.path.realpath(file_path)
+    schema = json.dumps(sheet_dtypes, sort_keys=True, default=lambda dtype: getattr(dtype, '__name__', str(dtype)))
+    digest = hashlib.sha1(f"{real_path}\n{schema}".encode()).hexdigest()[:16]
+    cache_root = os.path.join(os.path.dirname(real_path), CACHE_DIR)
+    cache_dir = os.path.join(cache_root, f"{stat.st_mtime_ns}_{stat.st_size}_{digest}")
+    index_file = os.path.join(cache_dir, 'sheets.json')
+    
+    if os.path.exists(index_file):
+        try:
+            with open(index_file, 'r') as f:
+                index = json.load(f)
+            sheets = {name: pd.read_pickle(os.path.join(cache_dir, f"{i}.pkl")) for i, name in enumerate(index['cached'])}
+            logger.info(f"Loaded {len(sheets)} sheets from cache '{cache_dir}'")
+            return index['sheet_names'], sheets
+        except (OSError, EOFError, ValueError, KeyError, TypeError, AttributeError, ImportError, pickle.UnpicklingError) as e:
+            logger.warning(f"Ignoring unreadable sheet cache '{cache_dir}': {e}")
+    
+    # Open the workbook once and parse every requested sheet from the same handle
+    with pd.ExcelFile(file_path, engine='openpyxl') as xls:
+        sheet_names = xls.sheet_names
+        sheets = {
+            sheet_name: pd.read_excel(xls, sheet_name=sheet_name, dtype=dtype)
+            for sheet_name, dtype in sheet_dtypes.items()
+            if sheet_name in sheet_names
+        }
+    
+    try:
+        # Drop entries cached for older versions of this workbook and schema
+        if os.path.isdir(cache_root):
+            for entry in os.listdir(cache_root):
+                if entry.endswith(f"_{digest}") and os.path.join(cache_root, entry) != cache_dir:
+                    shutil.rmtree(os.path.join(cache_root, entry), ignore_errors=True)
+        os.makedirs(cache_dir, exist_ok=True)
+        for i, sheet_data in enumerate(sheets.values()):
+            sheet_data.to_pickle(os.path.join(cache_dir, f"{i}.pkl"))
+        with open(index_file, 'w') as f:
+            json.dump({'sheet_names': sheet_names, 'cached': list(sheets)}, f)
+    except OSError as e:
+        logger.warning(f"Could not cache sheets: {e}")
+    
+    return sheet_names, sheets
+
 # Step 1: Load and Clean the Data
 def load_and_clean_data(file_path='dataset.xlsx'):
     """
@@ -23,7 +232,8 @@ def load_and_clean_data(file_path='dataset.xlsx'):
         file_path (str): Path to the Excel file
         
     Returns:
-        dict: Structured data dictionary or None if loading fails
+        dict: Structured data dictionary or None if loading fails. Sheet data
+            is stored as one DataFrame per key; rules are a list of dicts.
     """
     # Check if file exists
     if not os.path.exists(file_path):
@@ -38,8 +248,6 @@ def load_and_clean_data(file_path='dataset.xlsx'):
     
     # Load Excel file
     try:
-        xls = pd.ExcelFile(file_path)
-        logger.info(f"Found sheets: {xls.sheet_names}")
         structured_data = {}
         
         # Update sheet mappings to match the actual sheet names in the file
@@ -51,130 +259,71 @@ def load_and_clean_data(file_path='dataset.xlsx'):
             'Rooms data': 'rooms'
         }
         
+        # Text columns are read as strings so pandas skips type inference on them;
+        # numeric columns are left to coerce_integer_columns, which tolerates
+        # fractional or mixed cells that a nullable integer dtype would reject
+        sheet_dtypes = {
+            'Lecturer Details': {'Lecture Title': str, 'lecture Code': str},
+            'Course list': {'Course code': str, 'Title': str, 'Available blocks': str, 'Unavailable blocks': str},
+            'Student requests': {'College Year': str, 'Request start term': str, 'Title': str, 'Type': str,
+                                 'Course code': str, 'Department(s)': str},
+            'Rooms data': {'Course Title': str, ' Year': str, 'Term Description': str, 'Course Code': str, 'Term name': str},
+            'RULES': None
+        }
+        
+        sheet_names, sheets = read_sheets(file_path, sheet_dtypes)
+        logger.info(f"Found sheets: {sheet_names}")
+        
         # Process each sheet based on the actual sheet names
         for sheet_name, key in sheet_mappings.items():
-            if sheet_name in xls.sheet_names:
+            if sheet_name in sheets:
                 logger.info(f"Processing sheet: {sheet_name}")
-                sheet_data = pd.read_excel(xls, sheet_name)
-                
-                # Clean up sheet data - replace NaN with None for proper JSON serialization
-                sheet_data = sheet_data.replace({np.nan: None})
+                sheet_data = sheets[sheet_name]
                 
                 if not sheet_data.empty:
                     logger.info(f"{sheet_name} sheet has {len(sheet_data)} rows and {len(sheet_data.columns)} columns")
                     logger.info(f"Using original column names: {sheet_data.columns.tolist()}")
                     
-                    # Process sheet-specific data
-                    if key == 'course_characteristics':
-                        structured_data[key] = []
-                        # Process course characteristics with original column names
-                        for _, row in sheet_data.iterrows():
-                            row_dict = row.to_dict()
-                            # Use original column names
-                            if 'Available blocks' in row_dict and row_dict['Available blocks'] is not None:
-                                row_dict['Available blocks'] = str(row_dict['Available blocks']).split(', ') if pd.notna(row_dict['Available blocks']) else []
-                            if 'Unavailable blocks' in row_dict and row_dict['Unavailable blocks'] is not None:
-                                row_dict['Unavailable blocks'] = str(row_dict['Unavailable blocks']).split(', ') if pd.notna(row_dict['Unavailable blocks']) else []
-                            
-                            # Convert numeric values to appropriate types
-                            for field in ['Number of sections', 'Minimum section size', 'Target section size', 'Maximum section size', 'Length', 'Priority']:
-                                if field in row_dict and row_dict[field] is not None:
-                                    try:
-                                        row_dict[field] = int(row_dict[field])
-                                    except (ValueError, TypeError):
-                                        # Keep as is if conversion fails
-                                        pass
-                            
-                            structured_data[key].append(row_dict)
-                    elif key == 'course_listings':
-                        structured_data[key] = []
-                        # Process course listings
-                        for _, row in sheet_data.iterrows():
-                            row_dict = row.to_dict()
-                            
-                            # Convert numeric values to appropriate types
-                            for field in ['Lecturer ID', 'Section number', 'Length', 'Start Term']:
-                                if field in row_dict and row_dict[field] is not None:
-                                    try:
-                                        row_dict[field] = int(row_dict[field])
-                                    except (ValueError, TypeError):
-                                        # Keep as is if conversion fails
-                                        pass
-                            
-                            structured_data[key].append(row_dict)
-                    elif key == 'student_requests':
-                        structured_data[key] = []
-                        # Process student requests
-                        for _, row in sheet_data.iterrows():
-                            row_dict = row.to_dict()
-                            
-                            # Convert numeric values to appropriate types
-                            for field in ['student ID', 'Priority']:
-                                if field in row_dict and row_dict[field] is not None:
-                                    try:
-                                        row_dict[field] = int(row_dict[field])
-                                    except (ValueError, TypeError):
-                                        # Keep as is if conversion fails
-                                        pass
-                            
-                            structured_data[key].append(row_dict)
-                    elif key == 'rooms':
-                        structured_data[key] = []
-                        # Process rooms data
-                        for _, row in sheet_data.iterrows():
-                            row_dict = row.to_dict()
-                            
-                            # Convert numeric values to appropriate types
-                            for field in ['Room Number', 'Capacity']:
-                                if field in row_dict and row_dict[field] is not None:
-                                    try:
-                                        row_dict[field] = int(row_dict[field])
-                                    except (ValueError, TypeError):
-                                        # Keep as is if conversion fails
-                                        pass
-                            
-                            structured_data[key].append(row_dict)
-                    else:
-                        # Default processing for other sheets
-                        structured_data[key] = []
-                        for _, row in sheet_data.iterrows():
-                            structured_data[key].append(row.to_dict())
+                    # Process sheet-specific data with column-wise casts
+                    coerce_integer_columns(sheet_data, INTEGER_FIELDS.get(key, []))
+                    split_block_columns(sheet_data, BLOCK_LIST_FIELDS.get(key, []))
+                    for field in CATEGORY_FIELDS.get(key, []):
+                        if field in sheet_data.columns:
+                            sheet_data[field] = sheet_data[field].astype('category')
+                    
+                    # Keep the sheet columnar; rows become dicts only when saved
+                    structured_data[key] = sheet_data
                 else:
                     logger.info(f"{sheet_name} sheet is empty")
-                    structured_data[key] = []
+                    structured_data[key] = pd.DataFrame()
             else:
                 logger.info(f"Sheet '{sheet_name}' not found")
-                # Initialize empty lists for missing mappings
-                structured_data[key] = []
+                # Initialize empty frames for missing mappings
+                structured_data[key] = pd.DataFrame()
         
         # Extract rules from the RULES sheet
-        if 'RULES' in xls.sheet_names:
-            rules_data = pd.read_excel(xls, 'RULES').replace({np.nan: None})
+        if 'RULES' in sheets:
+            rules_data = sheets['RULES']
             if not rules_data.empty:
-                structured_data['rules'] = []
-                for _, row in rules_data.iterrows():
-                    rule_dict = row.to_dict()
-                    structured_data['rules'].append(rule_dict)
+                structured_data['rules'] = to_records(rules_data)
                 logger.info(f"Extracted {len(structured_data['rules'])} rules from RULES sheet")
         
-        # Ensure all required keys exist
-        for key in ['course_listings', 'course_characteristics', 'student_requests', 'rooms', 'rules']:
-            if key not in structured_data:
-                structured_data[key] = []
+        # Ensure the rules key exists
+        structured_data.setdefault('rules', [])
         
         # Add metadata about the data processing
         structured_data['metadata'] = {
             'source_file': file_path,
-            'processing_date': pd.Timestamp.now().isoformat(),
+            'processing_date': pd.Timestamp.now(),
             'total_courses': len(structured_data.get('course_characteristics', [])),
             'total_sections': len(structured_data.get('course_listings', [])),
             'total_requests': len(structured_data.get('student_requests', [])),
-            'total_rooms': len(structured_data.get('rooms', []))
+            'total_rooms': len(structured_data.get('rooms', [])),
+            'rooms_sheet_present': 'Rooms data' in sheets
         }
         
-        # Save to JSON
-        with open('cleaned_data.json', 'w') as f:
-            json.dump(structured_data, f, indent=4)
+        # Save to JSON, streaming the sheet frames as row dictionaries
+        save_structured_data(structured_data)
         logger.info("Data cleaned and saved to 'cleaned_data.json'")
         return structured_data
     
@@ -184,6 +333,9 @@ def load_and_clean_data(file_path='dataset.xlsx'):
         logger.error(traceback.format_exc())
         return None
 
+# Quoted block identifiers like "1A" or '2B' in rule text
+BLOCK_PATTERN = re.compile(r'["\'](\d+[A-Z])["\']')
+
 # Extract blocks from rule text
 def extract_blocks_from_rules(rules_data):
     """
@@ -195,17 +347,13 @@ def extract_blocks_from_rules(rules_data):
     Returns:
         list: List of unique block identifiers found in rules
     """
-    blocks = []
+    blocks = {}
     for rule in rules_data:
-        if 'RULES' in rule and isinstance(rule['RULES'], str):
-            # Look for block identifiers like "1A", "2B", etc.
-            block_matches = re.findall(r'["\']\d+[A-Z]["\']', rule['RULES'])
-            for match in block_matches:
-                # Clean up the block identifier
-                block = match.strip('\'"')
-                if block not in blocks:
-                    blocks.append(block)
-    return blocks
+        rule_text = rule.get('RULES')
+        if isinstance(rule_text, str):
+            # Dict keys keep first-seen order while deduplicating in O(1)
+            blocks.update(dict.fromkeys(BLOCK_PATTERN.findall(rule_text)))
+    return list(blocks)
 
 # Step 2: Validate the Data and Generate Insights
 def validate_data(data, file_path='dataset.xlsx'):
@@ -214,19 +362,24 @@ def validate_data(data, file_path='dataset.xlsx'):
     
     Args:
         data (dict): Cleaned data dictionary
-        file_path (str): Path to the original Excel file
+        file_path (str): Path to the original Excel file (kept for compatibility;
+            rooms sheet presence is read from data['metadata'])
         
     Returns:
-        tuple: (validation_report, insights) lists
+        tuple: (warnings, insights, stats) where stats holds the dataset totals
+            shared with the HTML report
     """
     validation_report = []
     insights = []
     critical_issues = []
     warnings = []
+    # Bind the append methods once; they are called throughout the checks below
+    warn = warnings.append
+    insight = insights.append
     
     # Check if essential data is present
     for key in ['course_listings', 'course_characteristics', 'student_requests']:
-        if key not in data or not data[key]:
+        if key not in data or len(data[key]) == 0:
             critical_issues.append(f"Missing or empty {key} data")
     
     # Process rules if available
@@ -234,188 +387,164 @@ def validate_data(data, file_path='dataset.xlsx'):
     blocks = []
     if 'rules' in data and data['rules']:
         rules_text = [rule['RULES'] for rule in data['rules'] if 'RULES' in rule and rule['RULES'] is not None]
+        # Truncate long rules once for both reports
+        rules_text = [rule[:200] + "..." if len(rule) > 200 else rule for rule in rules_text]
         blocks = extract_blocks_from_rules(data['rules'])
-        insights.append(f"Identified {len(blocks)} unique blocks from rules: {', '.join(blocks)}")
+        insight(f"Identified {len(blocks)} unique blocks from rules: {', '.join(blocks)}")
     else:
-        warnings.append("No rules found in the dataset")
+        warn("No rules found in the dataset")
+
+    # Build one frame over the requests so the checks below are column operations
+    req_df = pd.DataFrame(data['student_requests'], columns=['student ID', 'College Year', 'Course code', 'Type', 'Priority'])
 
     # Check request distribution (insight)
-    request_types = defaultdict(int)
-    for req in data['student_requests']:
-        req_type = req.get('Type')
-        if req_type:
-            request_types[req_type] += 1
+    request_types = req_df['Type'].value_counts().to_dict()
     
     total_requests = sum(request_types.values())
-    insights.append(f"Total requests: {total_requests} (Required: {request_types.get('Required', 0)}, "
+    insight(f"Total requests: {total_requests} (Required: {request_types.get('Required', 0)}, "
                     f"Requested: {request_types.get('Requested', 0)}, Recommended: {request_types.get('Recommended', 0)})")
 
     # Student demographics
-    students_by_year = defaultdict(set)
-    for req in data['student_requests']:
-        student_id = req.get('student ID')
-        year = req.get('College Year')
-        if student_id is not None and year:
-            students_by_year[year].add(student_id)
-    
-    total_students = sum(len(students) for students in students_by_year.values())
-    insights.append(f"Total unique students: {total_students}")
-    for year, students in sorted(students_by_year.items()):
-        insights.append(f"{year}: {len(students)} students")
+    year_requests = req_df.dropna(subset=['student ID', 'College Year'])
+    students_by_year = year_requests[year_requests['College Year'] != ''].groupby('College Year', observed=True)['student ID'].nunique()
+    
+    total_students = int(students_by_year.sum())
+    insight(f"Total unique students: {total_students}")
+    insights.extend(f"{year}: {count} students" for year, count in students_by_year.items())
 
     # Check required courses by year
     required_courses = {
         '1st Year': 'BIB9', '2nd Year': 'BIB10', '3rd Year': 'BIB11', '4th Year': 'BIB12'
     }
+    required_requests = req_df[(req_df['Type'] == 'Required') & req_df['Course code'].isin(required_courses.values())]
+    required_counts = required_requests.groupby(['College Year', 'Course code'], observed=True).size()
     for year, course_code in required_courses.items():
-        required_count = sum(1 for req in data['student_requests'] 
-                            if req.get('College Year') == year and req.get('Course code') == course_code and req.get('Type') == 'Required')
-        total_students = len(students_by_year[year])
+        required_count = int(required_counts.get((year, course_code), 0))
+        total_students = int(students_by_year.get(year, 0))
         if total_students > 0 and required_count < total_students:
             warning_msg = f"Missing required course: Only {required_count}/{total_students} {year} students requested {course_code}"
-            warnings.append(warning_msg)
-        insights.append(f"{year} - {course_code}: {required_count}/{total_students} requested")
+            warn(warning_msg)
+        insight(f"{year} - {course_code}: {required_count}/{total_students} requested")
 
     # Check courses with no requests
-    requested_courses = set(req.get('Course code') for req in data['student_requests'] if req.get('Course code'))
-    all_courses = set(course.get('Course code') for course in data['course_characteristics'] if course.get('Course code'))
+    demand_by_course = req_df['Course code'].value_counts()
+    requested_courses = set(demand_by_course.index) - {''}
+    chars_df = pd.DataFrame(data['course_characteristics'], columns=['Course code', 'Number of sections', 'Maximum section size'])
+    chars_df = chars_df[chars_df['Course code'].notna() & (chars_df['Course code'] != '')]
+    all_courses = set(chars_df['Course code'])
     no_request_courses = all_courses - requested_courses
     if no_request_courses:
-        warnings.append(f"Courses with no requests: {', '.join(sorted(no_request_courses))}")
-        insights.append(f"{len(no_request_courses)} courses have no student requests")
+        warn(f"Courses with no requests: {', '.join(sorted(no_request_courses))}")
+        insight(f"{len(no_request_courses)} courses have no student requests")
 
     # Check demand vs. capacity
-    demand_by_course = defaultdict(int)
-    for req in data['student_requests']:
-        course_code = req.get('Course code')
-        if course_code:
-            demand_by_course[course_code] += 1
-    
-    oversubscribed_courses = []
-    undersubscribed_courses = []
-    no_demand_courses = []
-    
-    for course in data['course_characteristics']:
-        course_code = course.get('Course code')
-        if not course_code:
-            continue
-            
-        demand = demand_by_course.get(course_code, 0)
-        num_sections = course.get('Number of sections', 0)
-        max_size = course.get('Maximum section size', 0)
-        
-        if num_sections and max_size:
-            capacity = num_sections * max_size
-            
-            if demand > capacity:
-                oversubscribed_courses.append((course_code, demand, capacity))
-                warnings.append(f"Over-subscribed: {course_code} has {demand} requests but {capacity} spots")
-            elif demand < 0.5 * capacity and demand > 0:
-                undersubscribed_courses.append((course_code, demand, capacity))
-                warnings.append(f"Under-subscribed: {course_code} has only {demand} requests for {capacity} spots")
-            elif demand == 0 and num_sections > 0:
-                no_demand_courses.append((course_code, num_sections))
-                warnings.append(f"No demand: {course_code} has {num_sections} sections but 0 requests")
-    
-    if oversubscribed_courses:
-        insights.append(f"{len(oversubscribed_courses)} courses are over-subscribed")
-    if undersubscribed_courses:
-        insights.append(f"{len(undersubscribed_courses)} courses are under-subscribed (less than 50% capacity)")
-    if no_demand_courses:
-        insights.append(f"{len(no_demand_courses)} courses have sections but no demand")
+    chars_df['sections'] = pd.to_numeric(chars_df['Number of sections'], errors='coerce').fillna(0).astype('int64')
+    chars_df['max_size'] = pd.to_numeric(chars_df['Maximum section size'], errors='coerce').fillna(0).astype('int64')
+    chars_df['capacity'] = chars_df['sections'] * chars_df['max_size']
+    merged = chars_df.merge(demand_by_course.rename('demand'), left_on='Course code', right_index=True, how='left')
+    merged['demand'] = merged['demand'].fillna(0).astype('int64')
+    
+    has_capacity = (merged['sections'] != 0) & (merged['max_size'] != 0)
+    oversubscribed = has_capacity & (merged['demand'] > merged['capacity'])
+    undersubscribed = has_capacity & ~oversubscribed & (merged['demand'] < 0.5 * merged['capacity']) & (merged['demand'] > 0)
+    no_demand = has_capacity & ~oversubscribed & ~undersubscribed & (merged['demand'] == 0) & (merged['sections'] > 0)
+    
+    # Build the messages column-wise, then emit them in course order
+    code, demand, capacity = merged['Course code'].astype(str), merged['demand'].astype(str), merged['capacity'].astype(str)
+    capacity_warnings = pd.Series('', index=merged.index)
+    capacity_warnings[oversubscribed] = "Over-subscribed: " + code + " has " + demand + " requests but " + capacity + " spots"
+    capacity_warnings[undersubscribed] = "Under-subscribed: " + code + " has only " + demand + " requests for " + capacity + " spots"
+    capacity_warnings[no_demand] = "No demand: " + code + " has " + merged['sections'].astype(str) + " sections but 0 requests"
+    warnings.extend(capacity_warnings[oversubscribed | undersubscribed | no_demand].tolist())
+    
+    if oversubscribed.any():
+        insight(f"{int(oversubscribed.sum())} courses are over-subscribed")
+    if undersubscribed.any():
+        insight(f"{int(undersubscribed.sum())} courses are under-subscribed (less than 50% capacity)")
+    if no_demand.any():
+        insight(f"{int(no_demand.sum())} courses have sections but no demand")
 
     # Check lecturer assignments
-    lecturers = set(course.get('Lecturer ID') for course in data['course_listings'] if course.get('Lecturer ID'))
-    insights.append(f"Total unique lecturers: {len(lecturers)}")
+    listings_df = pd.DataFrame(data['course_listings'], columns=['Lecturer ID', 'lecture Code'])
+    lecturers = listings_df['Lecturer ID'].dropna()
+    insight(f"Total unique lecturers: {lecturers[lecturers.astype(bool)].nunique()}")
     
     # Courses per lecturer
-    courses_per_lecturer = defaultdict(list)
-    for course in data['course_listings']:
-        lecturer_id = course.get('Lecturer ID')
-        course_code = course.get('lecture Code')
-        if lecturer_id and course_code:
-            courses_per_lecturer[lecturer_id].append(course_code)
+    assigned = listings_df.dropna()
+    assigned = assigned[assigned['Lecturer ID'].astype(bool) & assigned['lecture Code'].astype(bool)]
+    course_counts = assigned.groupby('Lecturer ID', observed=True).size()
     
     # Calculate lecturer workload distribution
-    if courses_per_lecturer:
-        course_counts = [len(courses) for courses in courses_per_lecturer.values()]
-        max_courses = max(course_counts)
-        min_courses = min(course_counts)
-        avg_courses = sum(course_counts) / len(course_counts)
-        insights.append(f"Lecturers teach between {min_courses} and {max_courses} courses (avg: {avg_courses:.1f})")
+    if not course_counts.empty:
+        max_courses = course_counts.max()
+        min_courses = course_counts.min()
+        avg_courses = course_counts.mean()
+        insight(f"Lecturers teach between {min_courses} and {max_courses} courses (avg: {avg_courses:.1f})")
         
         # Identify heavily loaded lecturers
-        heavy_load = [lid for lid, courses in courses_per_lecturer.items() if len(courses) > avg_courses + 2]
+        heavy_load = int((course_counts > avg_courses + 2).sum())
         if heavy_load:
-            warnings.append(f"{len(heavy_load)} lecturers have heavier than average course loads")
+            warn(f"{heavy_load} lecturers have heavier than average course loads")
     
     # Check room data if available
-    if 'rooms' in data and data['rooms']:
-        unique_rooms = len(data['rooms'])
-        total_capacity = sum(room.get('Capacity', 0) for room in data['rooms'])
-        insights.append(f"Total unique rooms: {unique_rooms}")
-        insights.append(f"Total room capacity: {total_capacity}")
+    if 'rooms' in data and len(data['rooms']) > 0:
+        rooms_df = pd.DataFrame(data['rooms'])
+        unique_rooms = len(rooms_df)
+        total_capacity = int(pd.to_numeric(rooms_df['Capacity'], errors='coerce').fillna(0).sum()) if 'Capacity' in rooms_df else 0
+        insight(f"Total unique rooms: {unique_rooms}")
+        insight(f"Total room capacity: {total_capacity}")
         
         # Check if room capacity is sufficient
-        total_students = sum(len(students) for students in students_by_year.values())
+        total_students = int(students_by_year.sum())
         if total_capacity < total_students:
             critical_issues.append(f"Insufficient room capacity: {total_capacity} seats for {total_students} students")
+    elif data.get('metadata', {}).get('rooms_sheet_present'):
+        # The Rooms data sheet exists but has no rows
+        insight("Total unique rooms: 0")
     else:
-        rooms_available = False
-        try:
-            if os.path.exists(file_path):
-                xls = pd.ExcelFile(file_path)
-                if 'Rooms data' in xls.sheet_names:
-                    rooms_data = pd.read_excel(file_path, 'Rooms data')
-                    unique_rooms = rooms_data['Room Number'].nunique()
-                    insights.append(f"Total unique rooms: {unique_rooms}")
-                    rooms_available = True
-        except Exception as e:
-            logger.warning(f"Could not analyze Rooms data: {e}")
-        
-        if not rooms_available:
-            warnings.append("No room data available for capacity planning")
+        warn("No room data available for capacity planning")
     
     # Check data consistency
-    course_codes_in_listings = set(course.get('lecture Code') for course in data['course_listings'] if course.get('lecture Code'))
-    course_codes_in_characteristics = set(course.get('Course code') for course in data['course_characteristics'] if course.get('Course code'))
+    course_codes_in_listings = set(listings_df['lecture Code'].dropna()) - {''}
+    course_codes_in_characteristics = all_courses
     
     missing_characteristics = course_codes_in_listings - course_codes_in_characteristics
     if missing_characteristics:
-        warnings.append(f"Courses in listings but missing characteristics: {', '.join(sorted(missing_characteristics))}")
+        warn(f"Courses in listings but missing characteristics: {', '.join(sorted(missing_characteristics))}")
     
     missing_listings = course_codes_in_characteristics - course_codes_in_listings
     if missing_listings:
-        warnings.append(f"Courses with characteristics but no listings: {', '.join(sorted(missing_listings))}")
+        warn(f"Courses with characteristics but no listings: {', '.join(sorted(missing_listings))}")
     
     # Check for invalid priority values
-    invalid_priorities = [(req.get('student ID'), req.get('Course code'), req.get('Priority')) 
-                          for req in data['student_requests'] 
-                          if req.get('Priority') not in [None, 1, 2, 3, 4, 5]]
+    invalid_priorities = int((req_df['Priority'].notna() & ~req_df['Priority'].isin([1, 2, 3, 4, 5])).sum())
     if invalid_priorities:
-        warnings.append(f"Found {len(invalid_priorities)} requests with invalid priority values")
+        warn(f"Found {invalid_priorities} requests with invalid priority values")
     
     # Check for duplicate requests
-    student_course_pairs = defaultdict(list)
-    for i, req in enumerate(data['student_requests']):
-        student_id = req.get('student ID')
-        course_code = req.get('Course code')
-        if student_id and course_code:
-            student_course_pairs[(student_id, course_code)].append(i)
-    
-    duplicate_requests = {k: v for k, v in student_course_pairs.items() if len(v) > 1}
+    pair_df = req_df[['student ID', 'Course code']].dropna()
+    pair_df = pair_df[pair_df['student ID'].astype(bool) & pair_df['Course code'].astype(bool)]
+    duplicate_requests = len(pair_df[pair_df.duplicated(keep=False)].drop_duplicates())
     if duplicate_requests:
-        warnings.append(f"Found {len(duplicate_requests)} duplicate student-course request pairs")
+        warn(f"Found {duplicate_requests} duplicate student-course request pairs")
+
+    # Dataset totals shared by both reports
+    stats = {
+        'total_courses': len(data.get('course_characteristics', [])),
+        'total_sections': len(data.get('course_listings', [])),
+        'total_requests': len(req_df),
+        'total_students': int(req_df['student ID'].nunique())
+    }
 
     # Write validation report
     with open('validation_report.md', 'w') as f:
         f.write("# Validation Report\n\n")
         
         f.write("## Data Overview\n")
-        f.write(f"- Total courses: {len(data.get('course_characteristics', []))}\n")
-        f.write(f"- Total course sections: {len(data.get('course_listings', []))}\n")
-        f.write(f"- Total student requests: {total_requests}\n")
-        f.write(f"- Total unique students: {total_students}\n\n")
+        f.write(f"- Total courses: {stats['total_courses']}\n")
+        f.write(f"- Total course sections: {stats['total_sections']}\n")
+        f.write(f"- Total student requests: {stats['total_requests']}\n")
+        f.write(f"- Total unique students: {stats['total_students']}\n\n")
         
         if critical_issues:
             f.write("## Critical Issues\n")
@@ -432,21 +561,21 @@ def validate_data(data, file_path='dataset.xlsx'):
         if rules_text:
             f.write("\n\n## Rules Summary\n")
             for i, rule in enumerate(rules_text, 1):
-                if rule and len(rule) > 200:  # Truncate long rules
-                    rule = rule[:200] + "..."
                 f.write(f"- Rule {i}: {rule}\n")
     
     logger.info("Validation complete. Report saved to 'validation_report.md'")
     
     # Create a more detailed HTML report with screenshots and code
-    create_detailed_report(data, warnings, insights, rules_text, critical_issues)
+    create_detailed_report(data, stats, warnings, insights, rules_text, critical_issues)
     
-    return warnings, insights
+    return warnings, insights, stats
 
-# Create a more detailed report with screenshots and code
-def create_detailed_report(data, warnings, insights, rules_text, critical_issues):
-    with open('detailed_report.html', 'w') as f:
-        f.write('''
+def escape(value):
+    """Escape a data value for embedding in the HTML report."""
+    return html.escape(str(value), quote=False)
+
+# Static sections of the detailed HTML report, filled in by create_detailed_report
+HEADER_HTML = '''
         <!DOCTYPE html>
         <html>
         <head>
@@ -467,18 +596,15 @@ def create_detailed_report(data, warnings, insights, rules_text, critical_issues
                 <h1>Course Scheduling Data Analysis - Detailed Report</h1>
                 
                 <h2>1. Data Overview</h2>
-        ''')
-        
-        # Data Overview
-        student_count = len(set(req['student ID'] for req in data['student_requests'])) if data['student_requests'] else 0
-        
-        f.write(f'''
+        '''
+
+OVERVIEW_TMPL = '''
                 <p>The dataset consists of:</p>
                 <ul>
-                    <li><strong>Courses:</strong> {len(data['course_characteristics'])}</li>
-                    <li><strong>Course Sections:</strong> {len(data['course_listings'])}</li>
-                    <li><strong>Student Requests:</strong> {len(data['student_requests'])}</li>
-                    <li><strong>Unique Students:</strong> {student_count}</li>
+                    <li><strong>Courses:</strong> %(total_courses)s</li>
+                    <li><strong>Course Sections:</strong> %(total_sections)s</li>
+                    <li><strong>Student Requests:</strong> %(total_requests)s</li>
+                    <li><strong>Unique Students:</strong> %(total_students)s</li>
                 </ul>
                 
                 <h2>2. Data Processing</h2>
@@ -495,65 +621,45 @@ def create_detailed_report(data, warnings, insights, rules_text, critical_issues
 def load_and_clean_data(file_path='dataset.xlsx'):
     # Check if file exists
     if not os.path.exists(file_path):
-        print(f"Error: File '{{file_path}}' not found.")
+        print(f"Error: File '{file_path}' not found.")
         return None
     
     # Load Excel file
     try:
         xls = pd.ExcelFile(file_path)
-        print(f"Found sheets: {{xls.sheet_names}}")
-        structured_data = {{}}
+        print(f"Found sheets: {xls.sheet_names}")
+        structured_data = {}
         
         # Process sheets and create structured data
         # ...
         
         return structured_data
     except Exception as e:
-        print(f"Error loading Excel file: {{e}}")
+        print(f"Error loading Excel file: {e}")
         return None
                 </pre>
                 
                 <h2>3. Validation Results</h2>
                 <h3>Issues Identified:</h3>
                 <ul>
-        ''')
-        
-        # Validation Issues
-        if warnings:
-            for issue in warnings:
-                f.write(f'<li>{issue}</li>\n')
-        else:
-            f.write('<li>No major issues found.</li>\n')
-        
-        f.write('''
+        '''
+
+INSIGHTS_HTML = '''
                 </ul>
                 
                 <h3>Key Insights:</h3>
                 <ul>
-        ''')
-        
-        # Insights
-        for insight in insights:
-            f.write(f'<li>{insight}</li>\n')
-        
-        f.write('''
+        '''
+
+RULES_HTML = '''
                 </ul>
                 
                 <h2>4. Rules Analysis</h2>
                 <p>The following scheduling rules were identified from the dataset:</p>
                 <ul>
-        ''')
-        
-        # Rules
-        if rules_text:
-            for i, rule in enumerate(rules_text, 1):
-                if len(rule) > 200:  # Truncate long rules
-                    rule = rule[:200] + "..."
-                f.write(f'<li><strong>Rule {i}:</strong> {rule}</li>\n')
-        else:
-            f.write('<li>No rules found or extracted.</li>\n')
-        
-        f.write('''
+        '''
+
+COURSE_TABLE_HTML = '''
                 </ul>
                 
                 <h2>5. Data Samples</h2>
@@ -566,22 +672,19 @@ def load_and_clean_data(file_path='dataset.xlsx'):
                         <th>Priority</th>
                         <th>Capacity</th>
                     </tr>
-        ''')
-        
-        # Course Samples
-        sample_courses = data['course_characteristics'][:5] if data['course_characteristics'] else []
-        for course in sample_courses:
-            f.write(f'''
+        '''
+
+COURSE_ROW_TMPL = '''
                     <tr>
-                        <td>{course.get('Course code', 'N/A')}</td>
-                        <td>{course.get('Title', 'N/A')}</td>
-                        <td>{course.get('Length', 'N/A')}</td>
-                        <td>{course.get('Priority', 'N/A')}</td>
-                        <td>{course.get('Maximum section size', 'N/A')}</td>
+                        <td>%s</td>
+                        <td>%s</td>
+                        <td>%s</td>
+                        <td>%s</td>
+                        <td>%s</td>
                     </tr>
-            ''')
-        
-        f.write('''
+            '''
+
+REQUEST_TABLE_HTML = '''
                 </table>
                 
                 <h3>Student Requests Sample:</h3>
@@ -593,22 +696,19 @@ def load_and_clean_data(file_path='dataset.xlsx'):
                         <th>Type</th>
                         <th>Priority</th>
                     </tr>
-        ''')
-        
-        # Student Request Samples
-        sample_requests = data['student_requests'][:5] if data['student_requests'] else []
-        for request in sample_requests:
-            f.write(f'''
+        '''
+
+REQUEST_ROW_TMPL = '''
                     <tr>
-                        <td>{request.get('student ID', 'N/A')}</td>
-                        <td>{request.get('College Year', 'N/A')}</td>
-                        <td>{request.get('Course code', 'N/A')}</td>
-                        <td>{request.get('Type', 'N/A')}</td>
-                        <td>{request.get('Priority', 'N/A')}</td>
+                        <td>%s</td>
+                        <td>%s</td>
+                        <td>%s</td>
+                        <td>%s</td>
+                        <td>%s</td>
                     </tr>
-            ''')
-        
-        f.write('''
+            '''
+
+FOOTER_HTML = '''
                 </table>
                 
                 <h2>6. Conclusion</h2>
@@ -625,7 +725,48 @@ def load_and_clean_data(file_path='dataset.xlsx'):
             </div>
         </body>
         </html>
-        ''')
+        '''
+
+COURSE_SAMPLE_FIELDS = ['Course code', 'Title', 'Length', 'Priority', 'Maximum section size']
+REQUEST_SAMPLE_FIELDS = ['student ID', 'College Year', 'Course code', 'Type', 'Priority']
+
+# Create a more detailed report with screenshots and code
+def create_detailed_report(data, stats, warnings, insights, rules_text, critical_issues):
+    # Collect the report in a list and write it with a single call
+    parts = [HEADER_HTML, OVERVIEW_TMPL % stats]
+    
+    # Validation Issues
+    if warnings:
+        parts.extend('<li>%s</li>\n' % escape(issue) for issue in warnings)
+    else:
+        parts.append('<li>No major issues found.</li>\n')
+    
+    # Insights
+    parts.append(INSIGHTS_HTML)
+    parts.extend('<li>%s</li>\n' % escape(insight) for insight in insights)
+    
+    # Rules
+    parts.append(RULES_HTML)
+    if rules_text:
+        parts.extend('<li><strong>Rule %d:</strong> %s</li>\n' % (i, escape(rule))
+                     for i, rule in enumerate(rules_text, 1))
+    else:
+        parts.append('<li>No rules found or extracted.</li>\n')
+    
+    # Course Samples
+    parts.append(COURSE_TABLE_HTML)
+    for course in to_records(data['course_characteristics'].head(5)):
+        parts.append(COURSE_ROW_TMPL % tuple(escape(course.get(field, 'N/A')) for field in COURSE_SAMPLE_FIELDS))
+    
+    # Student Request Samples
+    parts.append(REQUEST_TABLE_HTML)
+    for request in to_records(data['student_requests'].head(5)):
+        parts.append(REQUEST_ROW_TMPL % tuple(escape(request.get(field, 'N/A')) for field in REQUEST_SAMPLE_FIELDS))
+    
+    parts.append(FOOTER_HTML)
+    
+    with open('detailed_report.html', 'w') as f:
+        f.write(''.join(parts))
     
     print("Detailed HTML report created at 'detailed_report.html'")
 
@@ -1,11 +1,34 @@
 import json
 import pandas as pd
-from collections import defaultdict
+from collections import defaultdict, Counter
+from itertools import groupby
+from operator import itemgetter
 import random
 import matplotlib.pyplot as plt
 import os
-from tabulate import tabulate
 import numpy as np
+import logging
+import traceback
+
+try:
+    import orjson
+except ImportError:  # Fall back to the standard library encoder
+    orjson = None
+
+try:
+    from numba import njit, prange
+except ImportError:  # Run the scheduling kernels as plain, serial Python
+    def njit(*args, **kwargs):
+        return lambda func: func
+    prange = range
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
 
 # Step 1: Load Cleaned Data
 def load_cleaned_data(file_path='cleaned_data.json'):
@@ -22,7 +45,6 @@ def load_cleaned_data(file_path='cleaned_data.json'):
             return data
     except Exception as e:
         print(f"Error loading cleaned data: {str(e)}")
-        import traceback
         traceback.print_exc()
         return None
 
@@ -68,46 +90,57 @@ def extract_rules_and_constraints(data):
 # Step 3: Pre-process Data for Scheduling
 def preprocess_data(data, rules):
     """Prepare data structures needed for scheduling"""
-    # Map courses to lecturer IDs
-    course_to_lecturer = {}
-    for course in data['course_listings']:
-        lecturer_id = course.get('Lecturer ID', '')
-        course_code = course.get('lecture Code', '')
-        if course_code and lecturer_id:
-            # Handle multiple sections of the same course
-            section = course.get('Section number', 1)
-            course_key = f"{course_code}_{section}"
-            course_to_lecturer[course_key] = lecturer_id
+    # Map course sections to lecturer IDs; object dtype keeps the JSON values as they are
+    listings = pd.DataFrame(data['course_listings'], columns=['Lecturer ID', 'lecture Code', 'Section number'], dtype=object)
+    listings = listings[listings['Lecturer ID'].notna() & listings['Lecturer ID'].astype(bool)
+                        & listings['lecture Code'].notna() & listings['lecture Code'].astype(bool)]
+    # Handle multiple sections of the same course; a null section number stays a
+    # separate None key rather than overwriting section 1's lecturer
+    sections = listings['Section number']
+    course_keys = zip(listings['lecture Code'], sections.where(sections.notna(), None))
+    course_to_lecturer = dict(zip(course_keys, listings['Lecturer ID']))  # {(course_code, section_num): lecturer_id}
     
     # Map course codes to course details
+    # Block sets are also encoded as bitmasks, one bit per block in rules['all_blocks']
+    block_bit = {block: 1 << i for i, block in enumerate(rules['all_blocks'])}
     course_details = {}
     for course in data['course_characteristics']:
         course_code = course.get('Course code', '')
         if course_code:
+            # Missing block lists come through as None in the cleaned data
+            available_blocks = course.get('Available blocks') or rules['all_blocks']
+            unavailable_blocks = course.get('Unavailable blocks') or []
             course_details[course_code] = {
                 'title': course.get('Title', ''),
                 'length': course.get('Length', 4),
                 'priority': course.get('Priority', 0),
-                'available_blocks': course.get('Available blocks', rules['all_blocks']),
-                'unavailable_blocks': course.get('Unavailable blocks', []),
+                'available_blocks': available_blocks,
+                'unavailable_blocks': unavailable_blocks,
+                'avail_mask': sum(block_bit.get(block, 0) for block in set(available_blocks)),
+                'unavail_mask': sum(block_bit.get(block, 0) for block in set(unavailable_blocks)),
                 'min_size': course.get('Minimum section size', 5),
                 'target_size': course.get('Target section size', 20),
                 'max_size': course.get('Maximum section size', 25),
                 'num_sections': course.get('Number of sections', 1)
             }
     
-    # Group student requests by course code
-    course_requests = defaultdict(list)
+    # Tag each request with the index of its type in rules['priority_order'];
+    # request types outside the priority order are never scheduled
+    priority_map = {p: i for i, p in enumerate(rules['priority_order'])}
+    requests = []
     for req in data['student_requests']:
-        course_code = req.get('Course code', '')
-        if course_code:
-            course_requests[course_code].append(req)
-    
-    # Sort requests by priority
-    for course_code, requests in course_requests.items():
-        # Sort by priority: Required > Requested > Recommended
-        priority_map = {p: i for i, p in enumerate(rules['priority_order'])}
-        requests.sort(key=lambda x: priority_map.get(x.get('Type', 'Recommended'), 999))
+        prio = priority_map.get(req.get('Type'))
+        if prio is not None and req.get('Course code', ''):
+            req['_prio'] = prio
+            requests.append(req)
+    
+    # Group student requests by course code and priority with a single stable sort.
+    # Courses keep their first-appearance order.
+    course_rank = {course_code: i for i, course_code in enumerate(dict.fromkeys(map(itemgetter('Course code'), requests)))}
+    requests.sort(key=lambda req: (course_rank[req['Course code']], req['_prio']))
+    course_requests = {}  # {course_code: {priority: [requests]}}
+    for course_code, course_group in groupby(requests, key=itemgetter('Course code')):
+        course_requests[course_code] = {prio: list(group) for prio, group in groupby(course_group, key=itemgetter('_prio'))}
     
     return {
         'course_to_lecturer': course_to_lecturer,
@@ -115,218 +148,280 @@ def preprocess_data(data, rules):
         'course_requests': course_requests
     }
 
+def _lecturer_groups(section_ptr, section_lecturer):
+    """Partition courses into groups that share no lecturer, as CSR (group_ptr, group_courses)"""
+    parent = list(range(section_lecturer.max() + 1 if section_lecturer.size else 0))
+    
+    def find(lecturer):
+        while parent[lecturer] != lecturer:
+            parent[lecturer] = parent[parent[lecturer]]
+            lecturer = parent[lecturer]
+        return lecturer
+    
+    for c in range(len(section_ptr) - 1):
+        lecturers = section_lecturer[section_ptr[c]:section_ptr[c + 1]]
+        for lecturer in lecturers[1:]:
+            parent[find(lecturer)] = find(lecturers[0])
+    
+    # Courses without sections never take a block and belong to no group
+    courses = np.flatnonzero(np.diff(section_ptr) > 0)
+    roots = np.array([find(section_lecturer[section_ptr[c]]) for c in courses], dtype=np.int64)
+    order = np.argsort(roots, kind='stable')
+    group_courses = courses[order].astype(np.int64)
+    group_ptr = np.concatenate(([0], np.flatnonzero(np.diff(roots[order])) + 1, [len(courses)])).astype(np.int64)
+    return group_ptr, group_courses
+
+@njit('int64[:](int64[:, :], int64[:], int64[:], int64[:], int64[:], int64[:], int64[:], int64[:, :])',
+      parallel=True, nogil=True, cache=True)
+def _assign_sections(needed, usable_mask, section_ptr, section_lecturer, group_ptr, group_courses, teacher_mask, teacher_section):
+    """Assign blocks to course sections tier by tier, placing independent lecturer groups in parallel"""
+    section_block = np.full(section_lecturer.shape[0], -1, np.int64)
+    for g in prange(group_ptr.shape[0] - 1):
+        for t in range(needed.shape[0]):
+            for i in range(group_ptr[g], group_ptr[g + 1]):
+                c = group_courses[i]
+                if needed[t, c] == 0:
+                    continue
+                assigned_mask = 0
+                for k in range(needed[t, c]):
+                    sec = section_ptr[c] + k
+                    lecturer = section_lecturer[sec]
+                    candidate = usable_mask[c] & ~assigned_mask & ~teacher_mask[lecturer]
+                    if candidate == 0:
+                        continue
+                    # Isolate the lowest set bit and find its block index
+                    bit = candidate & -candidate
+                    b = 0
+                    while (bit >> b) != 1:
+                        b += 1
+                    assigned_mask |= bit
+                    teacher_mask[lecturer] |= bit
+                    section_block[sec] = b
+                    teacher_section[lecturer, b] = sec
+    return section_block
+
+@njit('int64[:](int64[:], int64[:], int64[:], int64[:], int64[:], int64[:], boolean[:, :])', nogil=True, cache=True)
+def _assign_students(req_student, req_course, open_ptr, open_sections, section_block, capacity, student_busy):
+    """Match requests to section seats in priority order with augmenting paths (Turner's priority matching)"""
+    n_requests = req_student.shape[0]
+    n_sections = section_block.shape[0]
+    width = 1
+    for sec in range(n_sections):
+        width = max(width, capacity[sec])
+    assigned = np.full(n_requests, -1, np.int64)
+    members = np.empty((n_sections, width), np.int64)  # request indices per section, in arrival order
+    count = np.zeros(n_sections, np.int64)
+    visited = np.zeros(n_sections, np.int64)  # root + 1 once explored in that root's search
+    on_path = np.zeros(student_busy.shape[0], np.bool_)
+    
+    # Depth-first search stack: request, position in open_sections, next occupant to try
+    frame_req = np.empty(n_requests, np.int64)
+    frame_sec = np.empty(n_requests, np.int64)
+    frame_occ = np.empty(n_requests, np.int64)
+    
+    for root in range(n_requests):
+        # Nothing to search when none of the course's sections were scheduled
+        if open_ptr[req_course[root]] == open_ptr[req_course[root] + 1]:
+            continue
+        stamp = root + 1
+        on_path[req_student[root]] = True
+        frame_req[0] = root
+        frame_sec[0] = open_ptr[req_course[root]]
+        frame_occ[0] = -1
+        depth = 1
+        while depth > 0:
+            top = depth - 1
+            r = frame_req[top]
+            s = req_student[r]
+            end = open_ptr[req_course[r] + 1]
+            child = -1
+            free = False
+            while frame_sec[top] < end:
+                sec = open_sections[frame_sec[top]]
+                if frame_occ[top] < 0:
+                    b = section_block[sec]
+                    cur = assigned[r]
+                    # The student's own current block is freed by the move
+                    if visited[sec] == stamp or (student_busy[s, b] and (cur < 0 or section_block[cur] != b)):
+                        frame_sec[top] += 1
+                        continue
+                    visited[sec] = stamp
+                    if count[sec] < capacity[sec]:
+                        free = True
+                        break
+                    frame_occ[top] = 0
+                while frame_occ[top] < count[sec]:
+                    occupant = members[sec, frame_occ[top]]
+                    frame_occ[top] += 1
+                    if not on_path[req_student[occupant]]:
+                        child = occupant
+                        break
+                if child >= 0:
+                    break
+                frame_occ[top] = -1
+                frame_sec[top] += 1
+            
+            if free:
+                # Free seat found: shift every request along the path, last one first
+                for i in range(top, -1, -1):
+                    r = frame_req[i]
+                    sec = open_sections[frame_sec[i]]
+                    s = req_student[r]
+                    old = assigned[r]
+                    if old >= 0:
+                        k = 0
+                        while members[old, k] != r:
+                            k += 1
+                        for k in range(k, count[old] - 1):
+                            members[old, k] = members[old, k + 1]
+                        count[old] -= 1
+                        student_busy[s, section_block[old]] = False
+                    assigned[r] = sec
+                    members[sec, count[sec]] = r
+                    count[sec] += 1
+                    student_busy[s, section_block[sec]] = True
+                    on_path[s] = False
+                depth = 0
+            elif child >= 0:
+                on_path[req_student[child]] = True
+                frame_req[depth] = child
+                frame_sec[depth] = open_ptr[req_course[child]]
+                frame_occ[depth] = -1
+                depth += 1
+            else:
+                # Dead end: drop this request from the path
+                on_path[s] = False
+                depth -= 1
+    
+    return assigned
+
 # Step 4: Generate Schedule Using Optimization
 def generate_schedule(data, rules, preprocessed_data):
     """Generate optimized schedule based on constraints and priorities"""
-    # Debug information
-    print(f"Data is None? {data is None}")
-    print(f"Rules is None? {rules is None}")
-    print(f"Preprocessed data is None? {preprocessed_data is None}")
-    
-    if preprocessed_data:
-        print(f"Preprocessed data keys: {list(preprocessed_data.keys())}")
-    
     # Check if input data is valid
     if not data or not rules or not preprocessed_data:
-        print("Error: Missing required data for scheduling. Ensure data, rules, and preprocessed_data are properly initialized.")
+        logger.error("Missing required data for scheduling. Ensure data, rules, and preprocessed_data are properly initialized.")
         return {}, {}, [], [], {}
-        
+    
     # Extract preprocessed data
-    print("Extracting preprocessed data...")
-    try:
-        print("Getting course_to_lecturer...")
-        course_to_lecturer = preprocessed_data.get('course_to_lecturer', {})
-        print("Getting course_details...")
-        course_details = preprocessed_data.get('course_details', {})
-        print("Getting course_requests...")
-        course_requests = preprocessed_data.get('course_requests', defaultdict(list))
-        
-        print(f"Extracted course_to_lecturer: {bool(course_to_lecturer)}")
-        print(f"Extracted course_details: {bool(course_details)}")
-        print(f"Extracted course_requests: {bool(course_requests)}")
-        
-        # Print types for debugging
-        print(f"Type of course_to_lecturer: {type(course_to_lecturer)}")
-        print(f"Type of course_details: {type(course_details)}")
-        print(f"Type of course_requests: {type(course_requests)}")
-        
-        # Check if course_requests is iterable
-        print("Checking if course_requests is iterable...")
-        try:
-            print(f"course_requests: {type(course_requests)}, is empty? {len(course_requests) == 0}")
-            # Check the first item if course_requests is not empty
-            if course_requests:
-                first_key = next(iter(course_requests), None)
-                if first_key:
-                    first_value = course_requests[first_key]
-                    print(f"First course code: {first_key}, value type: {type(first_value)}, length: {len(first_value)}")
-                    if first_value:
-                        print(f"Sample request: {first_value[0] if first_value else None}")
-                else:
-                    print("course_requests has no keys")
-            else:
-                print("course_requests is empty")
-                
-            # Safe iteration
-            count = 0
-            for course_code, requests in course_requests.items():
-                print(f"Found course_code: {course_code} with {len(requests)} requests")
-                count += 1
-                if count >= 3:  # Only show first 3 to avoid overwhelming output
-                    break
-            print("course_requests is iterable")
-        except Exception as e:
-            print(f"Error iterating course_requests: {str(e)}")
-            print("Resetting course_requests to empty defaultdict")
-            course_requests = defaultdict(list)
-    except Exception as e:
-        print(f"Error extracting preprocessed data: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return {}, {}, [], [], {}
+    course_to_lecturer = preprocessed_data.get('course_to_lecturer', {})
+    course_details = preprocessed_data.get('course_details', {})
+    course_requests = preprocessed_data.get('course_requests', {})
+    debug = logger.isEnabledFor(logging.DEBUG)
+    if debug:
+        logger.debug("Scheduling %d courses with %d lecturer assignments", len(course_requests), len(course_to_lecturer))
+    
+    # Integer-encode courses, sections, lecturers, students and blocks for the scheduling kernels
+    block_to_idx = {block: i for i, block in enumerate(rules['all_blocks'])}
+    course_codes = list(course_requests)
+    section_keys = []  # (course_code, section_num) per section index
+    section_labels = []  # course_info per section index
+    section_ptr = [0]
+    section_lecturer = []
+    lecturer_id_to_idx = {}
+    for course_code in course_codes:
+        for section_num in range(1, course_details.get(course_code, {}).get('num_sections', 1) + 1):
+            section_key = (course_code, section_num)
+            lecturer_id = course_to_lecturer.get(section_key, f"unknown_{course_code}")
+            section_lecturer.append(lecturer_id_to_idx.setdefault(lecturer_id, len(lecturer_id_to_idx)))
+            section_keys.append(section_key)
+            section_labels.append(f"{course_code} (Section {section_num})")
+        section_ptr.append(len(section_keys))
+    lecturer_ids = list(lecturer_id_to_idx)
+    section_ptr = np.array(section_ptr, dtype=np.int64)
+    section_lecturer = np.array(section_lecturer, dtype=np.int64)
+    student_ids = list(dict.fromkeys(
+        req['student ID']
+        for by_prio in course_requests.values()
+        for prio in range(len(rules['priority_order']))
+        for req in by_prio.get(prio, ())
+        if req.get('student ID', '')
+    ))
+    student_id_to_idx = {student_id: i for i, student_id in enumerate(student_ids)}
+    
+    # Per-course block preferences and the number of sections each priority tier needs
+    needed = np.zeros((len(rules['priority_order']), len(course_codes)), dtype=np.int64)
+    usable_mask = np.empty(len(course_codes), dtype=np.int64)
+    section_capacity = np.empty(len(section_keys), dtype=np.int64)
+    all_mask = (1 << len(block_to_idx)) - 1
+    for c, course_code in enumerate(course_codes):
+        course = course_details.get(course_code, {})
+        num_sections = course.get('num_sections', 1)
+        max_size = course.get('max_size', 25)
+        for t, prio_requests in course_requests[course_code].items():
+            needed[t, c] = min(num_sections, (len(prio_requests) + max_size - 1) // max_size)
+        usable_mask[c] = course.get('avail_mask', all_mask) & ~course.get('unavail_mask', 0)
+        section_capacity[section_ptr[c]:section_ptr[c + 1]] = max_size
     
     # Initialize data structures for scheduling
-    student_schedule = defaultdict(dict)  # {student_id: {block: course_info}}
-    teacher_schedule = defaultdict(dict)  # {lecturer_id: {block: course_info}}
-    section_assignments = defaultdict(list)  # {course_code_section: [student_ids]}
-    section_blocks = {}  # {course_code_section: block}
+    student_busy = np.zeros((len(student_ids), len(block_to_idx)), dtype=np.bool_)
+    teacher_mask = np.zeros(len(lecturer_ids), dtype=np.int64)  # busy block bits per lecturer
+    teacher_section = np.full((len(lecturer_ids), len(block_to_idx)), -1, dtype=np.int64)  # section per [lecturer, block]
+    student_course = np.empty(student_busy.shape, dtype=object)  # course_info per [student, block]
+    section_students = [[] for _ in section_keys]  # student IDs per section index
     
     # Track resolved/unresolved requests
     resolved_requests = []
     unresolved_requests = []
     
-    # First pass: Assign required courses to ensure they're scheduled
-    # This handles BIB9, BIB10, BIB11, BIB12 and other required courses
-    try:
-        print("Starting first pass - assigning required courses...")
-        print(f"Priority order: {rules['priority_order']}")
-        for req_type in rules['priority_order']:
-            print(f"Processing request type: {req_type}")
-            course_count = 0
-            for course_code, requests in course_requests.items():
-                course_count += 1
-                if course_count <= 3:  # Show debugging for first 3 courses
-                    print(f"Processing course: {course_code} with {len(requests)} requests")
-                
-                # Get course details
-                course = course_details.get(course_code, {})
-                num_sections = course.get('num_sections', 1)
-                max_size = course.get('max_size', 25)
-                available_blocks = course.get('available_blocks', rules['all_blocks'])
-                unavailable_blocks = course.get('unavailable_blocks', [])
-                
-                # Filter requests by current priority type
-                type_requests = [r for r in requests if r.get('Type', '') == req_type]
-                if not type_requests:
-                    continue
-                
-                if course_count <= 3:  # Show debugging for first 3 courses
-                    print(f"  Found {len(type_requests)} requests of type {req_type}")
-                
-                # Determine how many sections we need to create
-                needed_sections = min(num_sections, (len(type_requests) + max_size - 1) // max_size)
-                
-                if course_count <= 3:  # Show debugging for first 3 courses
-                    print(f"  Need {needed_sections} sections out of {num_sections} total")
-                
-                # Create sections and assign blocks
-                assigned_blocks = set()
-                for section_num in range(1, needed_sections + 1):
-                    section_key = f"{course_code}_{section_num}"
-                    
-                    # Find best block for this section that doesn't conflict
-                    best_block = None
-                    if course_count <= 3 and section_num <= 2:  # Show debugging for first 3 courses, first 2 sections
-                        print(f"  Looking for available block. Available blocks: {available_blocks}")
-                        print(f"  Unavailable blocks: {unavailable_blocks}")
-                        print(f"  Already assigned blocks: {assigned_blocks}")
-                    
-                    for block in available_blocks:
-                        if block in unavailable_blocks or block in assigned_blocks:
-                            if course_count <= 3 and section_num <= 2:
-                                print(f"    Block {block} is unavailable or already assigned")
-                            continue
-                        
-                        # Check lecturer availability for this block
-                        lecturer_id = course_to_lecturer.get(section_key, f"unknown_{course_code}")
-                        if block in teacher_schedule[lecturer_id]:
-                            if course_count <= 3 and section_num <= 2:
-                                print(f"    Block {block} conflicts with lecturer {lecturer_id}'s schedule")
-                            continue
-                        
-                        # This block works
-                        best_block = block
-                        if course_count <= 3 and section_num <= 2:
-                            print(f"    Found available block: {block}")
-                        break
-                    
-                    if best_block:
-                        assigned_blocks.add(best_block)
-                        section_blocks[section_key] = best_block
-                        
-                        # Pre-assign the lecturer to this block
-                        lecturer_id = course_to_lecturer.get(section_key, f"unknown_{course_code}")
-                        course_info_str = f"{course_code} (Section {section_num})"
-                        teacher_schedule[lecturer_id][best_block] = course_info_str
-                        
-                        if course_count <= 3 and section_num <= 2:  # Show debugging for first 3 courses, first 2 sections
-                            print(f"  Assigned section {section_num} to block {best_block}")
-                    else:
-                        if course_count <= 3 and section_num <= 2:
-                            print(f"  No available block found for section {section_num}!")
-    except Exception as e:
-        print(f"Error in first pass: {str(e)}")
-        import traceback
-        traceback.print_exc()
-    
-    # Second pass: Assign students to sections
-    for req_type in rules['priority_order']:
-        for course_code, requests in course_requests.items():
-            # Filter requests by current priority type
-            type_requests = [r for r in requests if r.get('Type', '') == req_type]
-            if not type_requests:
-                continue
-            
-            # Get course details
-            course = course_details.get(course_code, {})
-            num_sections = course.get('num_sections', 1)
-            max_size = course.get('max_size', 25)
-            
-            # Assign students to pre-created sections
-            for req in type_requests:
-                student_id = req.get('student ID', '')
-                if not student_id:
+    # First pass: Assign blocks to the sections each request type needs,
+    # starting with required courses so they're scheduled first
+    section_block = _assign_sections(
+        needed, usable_mask, section_ptr, section_lecturer, *_lecturer_groups(section_ptr, section_lecturer),
+        teacher_mask, teacher_section
+    )
+    if debug:
+        # Show the block chosen for each section of the first 3 courses
+        for c, course_code in enumerate(course_codes[:3]):
+            logger.debug("Course %s: up to %d sections per tier, blocks %s", course_code, needed[:, c].max(),
+                         [rules['all_blocks'][b] if b >= 0 else None for b in section_block[section_ptr[c]:section_ptr[c + 1]]])
+    
+    # Second pass: Assign students to sections with a single priority matching
+    # over all requests, highest priority type first
+    ranked_requests = []
+    ranked_courses = []
+    for prio in range(len(rules['priority_order'])):
+        for c, by_prio in enumerate(course_requests.values()):
+            for req in by_prio.get(prio, ()):
+                if not req.get('student ID', ''):
                     unresolved_requests.append(req)
                     continue
-                
-                # Try to assign to any available section
-                assigned = False
-                for section_num in range(1, num_sections + 1):
-                    section_key = f"{course_code}_{section_num}"
-                    block = section_blocks.get(section_key)
-                    
-                    # Skip if section wasn't assigned a block or is full
-                    if not block or len(section_assignments[section_key]) >= max_size:
-                        continue
-                    
-                    # Check if student is available in this block
-                    if block in student_schedule[student_id]:
-                        continue
-                    
-                    # Assign student to this section
-                    course_info_str = f"{course_code} (Section {section_num})"
-                    student_schedule[student_id][block] = course_info_str
-                    section_assignments[section_key].append(student_id)
-                    resolved_requests.append(req)
-                    assigned = True
-                    break
-                
-                if not assigned:
-                    unresolved_requests.append(req)
-    
-    # Convert defaultdicts to regular dicts for JSON serialization
-    student_schedule_dict = {student: dict(blocks) for student, blocks in student_schedule.items()}
-    teacher_schedule_dict = {teacher: dict(blocks) for teacher, blocks in teacher_schedule.items()}
+                ranked_requests.append(req)
+                ranked_courses.append(c)
+    
+    # Only sections that were given a block can take students; sections are
+    # numbered course by course, so each course's open sections stay contiguous
+    open_sections = np.flatnonzero(section_block >= 0).astype(np.int64)
+    open_ptr = np.searchsorted(open_sections, section_ptr).astype(np.int64)
+    
+    assigned_section = _assign_students(
+        np.array([student_id_to_idx[req['student ID']] for req in ranked_requests], dtype=np.int64),
+        np.array(ranked_courses, dtype=np.int64),
+        open_ptr, open_sections, section_block, section_capacity, student_busy
+    )
+    
+    for req, sec in zip(ranked_requests, assigned_section):
+        if sec < 0:
+            unresolved_requests.append(req)
+            continue
+        student_course[student_id_to_idx[req['student ID']], section_block[sec]] = section_labels[sec]
+        section_students[sec].append(req['student ID'])
+        resolved_requests.append(req)
+    
+    # Read the busy matrices back into {id: {block: course_info}} dicts for JSON serialization
+    blocks = rules['all_blocks']
+    section_assignments = {
+        section_keys[sec]: students for sec, students in enumerate(section_students) if students
+    }  # {(course_code, section_num): [student_ids]}
+    student_schedule_dict = {
+        student_ids[s]: {blocks[b]: student_course[s, b] for b in np.flatnonzero(student_busy[s])}
+        for s in np.flatnonzero(student_busy.any(axis=1))
+    }
+    teacher_busy = teacher_section >= 0
+    teacher_schedule_dict = {
+        lecturer_ids[t]: {blocks[b]: section_labels[teacher_section[t, b]] for b in np.flatnonzero(teacher_busy[t])}
+        for t in np.flatnonzero(teacher_busy.any(axis=1))
+    }
     
     return student_schedule_dict, teacher_schedule_dict, resolved_requests, unresolved_requests, section_assignments
 
@@ -345,21 +440,17 @@ def analyze_schedule(student_schedule, teacher_schedule, resolved, unresolved, s
     analysis['satisfaction_rate'] = satisfaction_rate
     
     # Analyze by request type
-    request_types = {}
-    for req in resolved:
-        req_type = req.get('Type', 'Unknown')
-        request_types[req_type] = request_types.get(req_type, 0) + 1
-    
-    for req in unresolved:
-        req_type = req.get('Type', 'Unknown')
-        request_types[req_type] = request_types.get(req_type, 0)
-    
-    analysis['request_types'] = request_types
+    resolved_types = Counter(req.get('Type', 'Unknown') for req in resolved)
+    unresolved_types = Counter(req.get('Type', 'Unknown') for req in unresolved)
+    analysis['request_types'] = {
+        'resolved': dict(resolved_types),
+        'unresolved': dict(unresolved_types)
+    }
     
     # Section fill rates
     section_fill_rates = {}
     for section_key, students in section_assignments.items():
-        course_code = section_key.split('_')[0]
+        course_code = section_key[0]
         if course_code in course_details:
             max_size = course_details[course_code].get('max_size', 25)
             fill_rate = len(students) / max_size * 100 if max_size > 0 else 0
@@ -395,16 +486,14 @@ def visualize_schedule(student_schedule, teacher_schedule, section_assignments,
     # Create a heatmap of student schedules by block
     blocks = rules['all_blocks']
     
-    # Student block distribution
-    block_counts = {block: 0 for block in blocks}
-    for student, schedule in student_schedule.items():
-        for block in schedule:
-            if block in block_counts:
-                block_counts[block] += 1
+    # Student block distribution; scheduled blocks always come from rules['all_blocks']
+    block_idx = {block: i for i, block in enumerate(blocks)}
+    scheduled_blocks = [block_idx[block] for schedule in student_schedule.values() for block in schedule]
+    block_counts = np.bincount(np.array(scheduled_blocks, dtype=np.int64), minlength=len(blocks))
     
     # Plot student distribution by block
     plt.figure(figsize=(10, 6))
-    plt.bar(block_counts.keys(), block_counts.values())
+    plt.bar(blocks, block_counts)
     plt.title('Student Distribution by Block')
     plt.xlabel('Block')
     plt.ylabel('Number of Students')
@@ -415,8 +504,8 @@ def visualize_schedule(student_schedule, teacher_schedule, section_assignments,
     
     # Section fill rates visualization
     if analysis.get('section_fill_rates'):
-        section_keys = list(analysis['section_fill_rates'].keys())
-        fill_rates = [analysis['section_fill_rates'][k]['fill_rate'] for k in section_keys]
+        section_keys = [f"{course_code}_{section_num}" for course_code, section_num in analysis['section_fill_rates']]
+        fill_rates = [rates['fill_rate'] for rates in analysis['section_fill_rates'].values()]
         
         plt.figure(figsize=(12, 6))
         plt.bar(section_keys, fill_rates)
@@ -536,18 +625,39 @@ def visualize_schedule(student_schedule, teacher_schedule, section_assignments,
         </html>
         ''')
 
+def schedule_table(schedule, blocks):
+    """Format a {block: course_info} schedule as a left-aligned Markdown pipe table"""
+    courses = [schedule.get(block, "") for block in blocks]
+    block_width = max(len("Block") + 2, max(map(len, blocks), default=0))
+    course_width = max(len("Course") + 2, max(map(len, courses), default=0))
+    lines = [
+        f"| {'Block':<{block_width}} | {'Course':<{course_width}} |",
+        f"|:{'-' * (block_width + 1)}|:{'-' * (course_width + 1)}|"
+    ]
+    lines.extend(f"| {block:<{block_width}} | {course:<{course_width}} |" for block, course in zip(blocks, courses))
+    return "\n".join(lines)
+
+def write_json(path, obj):
+    """Write obj to path as indented JSON, using orjson when it is installed"""
+    if orjson is not None:
+        with open(path, 'wb') as f:
+            f.write(orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+    else:
+        with open(path, 'w') as f:
+            json.dump(obj, f, indent=2)
+
 # Step 7: Save Outputs
 def save_outputs(student_schedule, teacher_schedule, resolved, unresolved, section_assignments, rules, analysis, output_dir='.'):
     """Save all outputs to files"""
     os.makedirs(output_dir, exist_ok=True)
     
     # Student Schedules
-    with open(f"{output_dir}/student_schedules.json", 'w') as f:
-        json.dump(student_schedule, f, indent=4)
+    write_json(f"{output_dir}/student_schedules.json", student_schedule)
     
     # Teacher Schedules
-    with open(f"{output_dir}/teacher_schedules.json", 'w') as f:
-        json.dump(teacher_schedule, f, indent=4)
+    write_json(f"{output_dir}/teacher_schedules.json", teacher_schedule)
+    
+    sorted_blocks = sorted(rules['all_blocks'])
     
     # Create a user-friendly version of student schedules
     with open(f"{output_dir}/student_schedules.md", 'w') as f:
@@ -558,13 +668,7 @@ def save_outputs(student_schedule, teacher_schedule, resolved, unresolved, secti
             f.write(f"## Student: {student}\n\n")
             
             # Create a table for this student's schedule
-            headers = ["Block", "Course"]
-            rows = []
-            for block in sorted(rules['all_blocks']):
-                course = student_schedule[student].get(block, "")
-                rows.append([block, course])
-            
-            f.write(tabulate(rows, headers=headers, tablefmt="pipe"))
+            f.write(schedule_table(student_schedule[student], sorted_blocks))
             f.write("\n\n")
     
     # Create a user-friendly version of teacher schedules
@@ -576,13 +680,7 @@ def save_outputs(student_schedule, teacher_schedule, resolved, unresolved, secti
             f.write(f"## Teacher: {teacher}\n\n")
             
             # Create a table for this teacher's schedule
-            headers = ["Block", "Course"]
-            rows = []
-            for block in sorted(rules['all_blocks']):
-                course = teacher_schedule[teacher].get(block, "")
-                rows.append([block, course])
-            
-            f.write(tabulate(rows, headers=headers, tablefmt="pipe"))
+            f.write(schedule_table(teacher_schedule[teacher], sorted_blocks))
             f.write("\n\n")
     
     # Request resolution stats
@@ -626,9 +724,12 @@ def save_outputs(student_schedule, teacher_schedule, resolved, unresolved, secti
             success_rate = (stats['resolved'] / total * 100) if total > 0 else 0
             f.write(f"| {priority} | {stats['resolved']} | {stats['unresolved']} | {total} | {success_rate:.2f}% |\n")
     
-    # Save analysis results
-    with open(f"{output_dir}/schedule_analysis.json", 'w') as f:
-        json.dump(analysis, f, indent=4)
+    # Save analysis results, with section keys formatted as course_code_section
+    section_fill_rates = {
+        f"{course_code}_{section_num}": rates
+        for (course_code, section_num), rates in analysis['section_fill_rates'].items()
+    }
+    write_json(f"{output_dir}/schedule_analysis.json", {**analysis, 'section_fill_rates': section_fill_rates})
     
     # Visualization
     visualize_schedule(student_schedule, teacher_schedule, section_assignments, rules, analysis, output_dir)
@@ -681,7 +782,6 @@ def main():
             print(f"Got section assignments: {len(section_assignments)}")
         except Exception as e:
             print(f"Error in generate_schedule: {str(e)}")
-            import traceback
             traceback.print_exc()
             return
         
@@ -695,7 +795,6 @@ def main():
             print("Schedule analysis complete")
         except Exception as e:
             print(f"Error in analyze_schedule: {str(e)}")
-            import traceback
             traceback.print_exc()
             return
         
@@ -709,7 +808,6 @@ def main():
             print("Outputs saved successfully")
         except Exception as e:
             print(f"Error in save_outputs: {str(e)}")
-            import traceback
             traceback.print_exc()
             return
         
@@ -718,7 +816,6 @@ def main():
             print(f"Satisfaction rate: {analysis['satisfaction_rate']:.2f}%")
     except Exception as e:
         print(f"Error in main function: {str(e)}")
-        import traceback
         traceback.print_exc()
 
 if __name__ == "__main__":
@@ -1,13 +1,66 @@
 import json
 import pandas as pd
+import numpy as np
 from collections import defaultdict
+from operator import itemgetter
 import os
+import logging
+
+try:
+    import orjson
+except ImportError:  # Fall back to the standard library encoder
+    orjson = None
+
+try:
+    import ijson
+except ImportError:  # Parse the whole file instead of streaming it
+    ijson = None
+
+try:
+    from numba import njit
+except ImportError:  # Run the assignment loop as plain Python
+    def njit(*args, **kwargs):
+        return lambda func: func
+
+logger = logging.getLogger(__name__)
+
+# Inputs at least this large are streamed with ijson instead of parsed whole
+STREAM_MIN_BYTES = 64 * 1024 * 1024
+
+class CleanedData:
+    """Sheets of the cleaned data, streamed from file_path or read from already parsed sheets"""
+    
+    def __init__(self, file_path, sheets=None):
+        self.file_path = file_path
+        self.sheets = sheets
+    
+    def iter_sheet(self, name):
+        """Yield the rows of one sheet"""
+        if self.sheets is not None:
+            yield from self.sheets.get(name) or []
+            return
+        with open(self.file_path, 'rb') as f:
+            yield from ijson.items(f, f"{name}.item", use_float=True)
+    
+    def iter_course_listings(self):
+        return self.iter_sheet('course_listings')
+    
+    def iter_course_characteristics(self):
+        return self.iter_sheet('course_characteristics')
+    
+    def iter_student_requests(self):
+        return self.iter_sheet('student_requests')
 
 def load_cleaned_data(file_path='cleaned_data.json'):
-    """Load the cleaned data from JSON file"""
+    """Load the cleaned data from JSON file, streaming large files sheet by sheet"""
     try:
+        if ijson is not None and os.path.getsize(file_path) >= STREAM_MIN_BYTES:
+            return CleanedData(file_path)
+        if orjson is not None:
+            with open(file_path, 'rb') as f:
+                return CleanedData(file_path, orjson.loads(f.read()))
         with open(file_path, 'r') as f:
-            return json.load(f)
+            return CleanedData(file_path, json.load(f))
     except Exception as e:
         print(f"Error loading data: {e}")
         return None
@@ -29,7 +82,7 @@ def preprocess_data(data, rules):
     """Prepare data structures for scheduling"""
     # Course to lecturer mapping
     course_to_lecturer = {}
-    for course in data.get('course_listings', []):
+    for course in data.iter_course_listings():
         lecturer_id = course.get('Lecturer ID')
         course_code = course.get('lecture Code')
         section = course.get('Section number', 1)
@@ -38,8 +91,9 @@ def preprocess_data(data, rules):
             course_to_lecturer[key] = lecturer_id
     
     # Course details mapping
+    block_bit = {block: 1 << i for i, block in enumerate(rules['all_blocks'])}
     course_details = {}
-    for course in data.get('course_characteristics', []):
+    for course in data.iter_course_characteristics():
         course_code = course.get('Course code')
         if course_code:
             # Handle NoneType values
@@ -57,14 +111,21 @@ def preprocess_data(data, rules):
                 'num_sections': course.get('Number of sections', 1),
                 'max_size': course.get('Maximum section size', 25),
                 'available_blocks': available_blocks,
-                'unavailable_blocks': unavailable_blocks
+                'unavailable_blocks': unavailable_blocks,
+                # Available and not unavailable blocks, one bit per block in rules['all_blocks']
+                'usable_mask': sum(
+                    block_bit.get(block, 0)
+                    for block in set(available_blocks or rules['all_blocks']) - set(unavailable_blocks)
+                )
             }
     
-    # Group student requests by course
+    # Group student requests by course, tagging each with its priority rank
+    priority_map = {p: i for i, p in enumerate(rules['priority_order'])}
     course_requests = defaultdict(list)
-    for req in data.get('student_requests', []):
+    for req in data.iter_student_requests():
         course_code = req.get('Course code')
         if course_code:
+            req['_prio'] = priority_map.get(req.get('Type', 'Recommended'), 999)
             course_requests[course_code].append(req)
     
     return {
@@ -73,6 +134,61 @@ def preprocess_data(data, rules):
         'course_requests': course_requests
     }
 
+def match_sections_to_blocks(candidates):
+    """Match sections to distinct blocks, returning each section's block index or None"""
+    # Bipartite matching over per-section block bitmasks: a section takes its lowest
+    # free block, agreeing with first-fit, and only otherwise searches an augmenting path
+    block_owner = {}  # {block index: section index}
+    taken = 0  # bits of the blocks in block_owner
+    
+    def augment(i, seen):
+        nonlocal taken
+        options = candidates[i]
+        while options:
+            bit = options & -options
+            options ^= bit
+            if seen[0] & bit:
+                continue
+            seen[0] |= bit
+            block = bit.bit_length() - 1
+            if not taken & bit or augment(block_owner[block], seen):
+                block_owner[block] = i
+                taken |= bit
+                return True
+        return False
+    
+    for i, mask in enumerate(candidates):
+        # No usable block is free for the lecturer: nothing to search
+        if not mask:
+            continue
+        free = mask & ~taken
+        if free:
+            bit = free & -free
+            block_owner[bit.bit_length() - 1] = i
+            taken |= bit
+        else:
+            augment(i, [0])
+    
+    matched = [None] * len(candidates)
+    for block, i in block_owner.items():
+        matched[i] = block
+    return matched
+
+@njit('void(int64[:], int64[:], int64[:], int64[:], int64[:], int64[:], int64[:], int64[:])', cache=True)
+def _assign(req_student, req_course, sec_ptr, sec_bit, sec_max, student_mask, section_fill, out_assignment):
+    """Give each request, in order, the first section of its course with room and no block clash"""
+    for r in range(req_student.shape[0]):
+        s = req_student[r]
+        c = req_course[r]
+        for sec in range(sec_ptr[c], sec_ptr[c + 1]):
+            # Skip if section is full or student already has a class in this block
+            if section_fill[sec] >= sec_max[sec] or student_mask[s] & sec_bit[sec]:
+                continue
+            student_mask[s] |= sec_bit[sec]
+            section_fill[sec] += 1
+            out_assignment[r] = sec
+            break
+
 def generate_schedule(data, rules, preprocessed):
     """Generate a course schedule"""
     # Extract preprocessed data
@@ -82,8 +198,10 @@ def generate_schedule(data, rules, preprocessed):
     
     # Initialize data structures
     student_schedule = defaultdict(dict)  # {student_id: {block: course}}
+    student_courses = defaultdict(dict)  # {student_id: {block: course_code}}
     teacher_schedule = defaultdict(dict)  # {teacher_id: {block: course}}
-    section_assignments = defaultdict(list)  # {course_section: [student_ids]}
+    teacher_mask = defaultdict(int)  # {teacher_id: busy block bits}
+    block_bit = {block: 1 << i for i, block in enumerate(rules['all_blocks'])}
     section_blocks = {}  # {course_section: block}
     
     # Track resolved/unresolved requests
@@ -91,135 +209,161 @@ def generate_schedule(data, rules, preprocessed):
     unresolved = []
     
     print(f"Generating schedule with {len(course_requests)} courses...")
+    debug = logger.isEnabledFor(logging.DEBUG)
+    
+    # Place the most constrained courses first: fewest usable blocks, then fewest sections
+    def constraint_key(item):
+        course = course_details.get(item[0])
+        if course is None:
+            return (0, 0)
+        return (bin(course['usable_mask']).count('1'), course.get('num_sections', 1))
+    
+    ordered_courses = sorted(course_requests.items(), key=constraint_key)
     
     # First pass: Assign course sections to blocks
-    for course_code, requests in course_requests.items():
-        print(f"Processing course: {course_code} with {len(requests)} requests")
+    for course_code, requests in ordered_courses:
+        if debug:
+            logger.debug("Processing course: %s with %d requests", course_code, len(requests))
         
         # Skip if no course details available
         if course_code not in course_details:
-            print(f"  No details for course {course_code}, skipping")
+            if debug:
+                logger.debug("  No details for course %s, skipping", course_code)
             unresolved.extend(requests)
             continue
         
         course = course_details[course_code]
         num_sections = course.get('num_sections', 1)
-        max_size = course.get('max_size', 25)
         
-        # Get available blocks
-        available_blocks = course.get('available_blocks', rules['all_blocks'])
-        if not available_blocks:
-            available_blocks = rules['all_blocks']
-            
-        unavailable_blocks = course.get('unavailable_blocks', [])
-        if not unavailable_blocks:
-            unavailable_blocks = []
-            
-        print(f"  Available blocks: {available_blocks}")
-        print(f"  Unavailable blocks: {unavailable_blocks}")
+        if debug:
+            logger.debug("  Available blocks: %s", course.get('available_blocks') or rules['all_blocks'])
+            logger.debug("  Unavailable blocks: %s", course.get('unavailable_blocks') or [])
         
-        # Assign blocks to each section
-        assigned_blocks = set()
-        for section_num in range(1, num_sections + 1):
-            section_key = f"{course_code}_{section_num}"
-            print(f"  Processing section: {section_key}")
-            
-            # Find best block
-            best_block = None
-            for block in rules['all_blocks']:
-                # Skip if block not available for this course or already assigned
-                if block not in available_blocks or block in unavailable_blocks or block in assigned_blocks:
-                    continue
-                
-                # Check lecturer availability
-                lecturer_id = course_to_lecturer.get(section_key, f"unknown_{course_code}")
-                if block in teacher_schedule[lecturer_id]:
-                    continue
-                
-                # This block works
-                best_block = block
-                break
+        # Each section can use the course's blocks that are free for its lecturer;
+        # match the sections to distinct blocks so none is left out needlessly
+        section_keys = [f"{course_code}_{section_num}" for section_num in range(1, num_sections + 1)]
+        lecturer_ids = [course_to_lecturer.get(section_key, f"unknown_{course_code}") for section_key in section_keys]
+        candidates = [course['usable_mask'] & ~teacher_mask[lecturer_id] for lecturer_id in lecturer_ids]
+        matched_blocks = match_sections_to_blocks(candidates)
+        
+        for section_num, (section_key, lecturer_id, block_index) in enumerate(zip(section_keys, lecturer_ids, matched_blocks), 1):
+            if debug:
+                logger.debug("  Processing section: %s", section_key)
             
-            if best_block:
-                print(f"  Assigned block {best_block} to section {section_key}")
-                assigned_blocks.add(best_block)
+            if block_index is not None:
+                best_block = rules['all_blocks'][block_index]
+                if debug:
+                    logger.debug("  Assigned block %s to section %s", best_block, section_key)
                 section_blocks[section_key] = best_block
                 
                 # Assign lecturer
-                lecturer_id = course_to_lecturer.get(section_key, f"unknown_{course_code}")
                 course_info = f"{course_code} (Section {section_num})"
                 teacher_schedule[lecturer_id][best_block] = course_info
-            else:
-                print(f"  No available block for section {section_key}")
+                teacher_mask[lecturer_id] |= block_bit[best_block]
+            elif debug:
+                logger.debug("  No available block for section %s", section_key)
     
-    # Second pass: Assign students to sections
+    # Sections that were given a block, per course, in section order
+    course_sections_blocks = {}  # {course_code: [(course_section, block, course_info)]}
+    for course_code in course_requests:
+        if course_code not in course_details:
+            continue
+        sections = []
+        for section_num in range(1, course_details[course_code].get('num_sections', 1) + 1):
+            section_key = f"{course_code}_{section_num}"
+            if section_key in section_blocks:
+                sections.append((section_key, section_blocks[section_key], f"{course_code} (Section {section_num})"))
+        course_sections_blocks[course_code] = sections
+    
+    # Integer-encode students and scheduled sections for the assignment loop
+    student_idx = {}
+    section_list = []  # (course_section, block, course_info) per section index
+    section_course = []  # course_code per section index
+    sec_ptr = [0]
+    sec_max = []
+    ordered_requests = []
+    req_student = []
+    req_course = []
     for course_code, requests in course_requests.items():
         if course_code not in course_details:
             continue
-            
-        course = course_details[course_code]
-        num_sections = course.get('num_sections', 1)
-        max_size = course.get('max_size', 25)
+        
+        # Sections of this course occupy sec_ptr[c]:sec_ptr[c + 1]
+        c = len(sec_ptr) - 1
+        sections = course_sections_blocks[course_code]
+        section_list.extend(sections)
+        section_course.extend([course_code] * len(sections))
+        sec_max.extend([course_details[course_code].get('max_size', 25)] * len(sections))
+        sec_ptr.append(len(section_list))
         
         # Sort requests by priority
-        priority_map = {p: i for i, p in enumerate(rules['priority_order'])}
-        requests.sort(key=lambda x: priority_map.get(x.get('Type', 'Recommended'), 999))
+        requests.sort(key=itemgetter('_prio'))
         
-        # Assign students to sections
         for req in requests:
             student_id = req.get('student ID')
             if not student_id:
                 unresolved.append(req)
                 continue
-            
-            # Try to assign to any available section
-            assigned = False
-            for section_num in range(1, num_sections + 1):
-                section_key = f"{course_code}_{section_num}"
-                block = section_blocks.get(section_key)
-                
-                # Skip if section has no block or is full
-                if not block or len(section_assignments[section_key]) >= max_size:
-                    continue
-                
-                # Skip if student already has a class in this block
-                if block in student_schedule[student_id]:
-                    continue
-                
-                # Assign student to this section
-                course_info = f"{course_code} (Section {section_num})"
-                student_schedule[student_id][block] = course_info
-                section_assignments[section_key].append(student_id)
-                resolved.append(req)
-                assigned = True
-                break
-            
-            if not assigned:
-                unresolved.append(req)
+            ordered_requests.append(req)
+            req_student.append(student_idx.setdefault(student_id, len(student_idx)))
+            req_course.append(c)
+    
+    # Second pass: Assign students to sections
+    student_mask = np.zeros(len(student_idx), dtype=np.int64)  # busy block bits per student
+    section_fill = np.zeros(len(section_list), dtype=np.int64)
+    assignment = np.full(len(ordered_requests), -1, dtype=np.int64)
+    _assign(
+        np.array(req_student, dtype=np.int64), np.array(req_course, dtype=np.int64),
+        np.array(sec_ptr, dtype=np.int64), np.array([block_bit[block] for _, block, _ in section_list], dtype=np.int64),
+        np.array(sec_max, dtype=np.int64), student_mask, section_fill, assignment
+    )
+    
+    # Decode the assignment back to schedules keyed by ID and block
+    section_assignments = {section_key: [] for section_key, _, _ in section_list}  # {course_section: [student_ids]}
+    for req, sec in zip(ordered_requests, assignment):
+        if sec < 0:
+            unresolved.append(req)
+            continue
+        section_key, block, course_info = section_list[sec]
+        student_schedule[req['student ID']][block] = course_info
+        student_courses[req['student ID']][block] = section_course[sec]
+        section_assignments[section_key].append(req['student ID'])
+        resolved.append(req)
     
     # Convert defaultdicts to regular dicts for JSON
     student_schedule_dict = {student: dict(blocks) for student, blocks in student_schedule.items()}
+    student_courses_dict = {student: dict(blocks) for student, blocks in student_courses.items()}
     teacher_schedule_dict = {teacher: dict(blocks) for teacher, blocks in teacher_schedule.items()}
     
     print(f"Schedule generated. Assigned {len(resolved)} requests, {len(unresolved)} unresolved.")
     print(f"Number of students scheduled: {len(student_schedule_dict)}")
     print(f"Number of teachers scheduled: {len(teacher_schedule_dict)}")
     
-    return student_schedule_dict, teacher_schedule_dict, resolved, unresolved, section_assignments
+    return student_schedule_dict, teacher_schedule_dict, resolved, unresolved, section_assignments, student_courses_dict
+
+def write_json(path, obj):
+    """Write obj to path as indented JSON, using orjson when it is installed"""
+    if orjson is not None:
+        with open(path, 'wb') as f:
+            f.write(orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+    else:
+        with open(path, 'w') as f:
+            json.dump(obj, f, indent=2)
 
 def save_results(results, output_dir='simple_output'):
     """Save the scheduling results to files"""
     os.makedirs(output_dir, exist_ok=True)
     
-    student_schedule, teacher_schedule, resolved, unresolved, section_assignments = results
+    student_schedule, teacher_schedule, resolved, unresolved, section_assignments, student_courses = results
     
     # Save student schedules
-    with open(f"{output_dir}/student_schedules.json", 'w') as f:
-        json.dump(student_schedule, f, indent=4)
+    write_json(f"{output_dir}/student_schedules.json", student_schedule)
+    
+    # Save course codes per student and block for the visualizations
+    write_json(f"{output_dir}/student_courses.json", student_courses)
     
     # Save teacher schedules
-    with open(f"{output_dir}/teacher_schedules.json", 'w') as f:
-        json.dump(teacher_schedule, f, indent=4)
+    write_json(f"{output_dir}/teacher_schedules.json", teacher_schedule)
     
     # Save statistics
     total_requests = len(resolved) + len(unresolved)
@@ -235,8 +379,7 @@ def save_results(results, output_dir='simple_output'):
         'sections_created': len(section_assignments)
     }
     
-    with open(f"{output_dir}/stats.json", 'w') as f:
-        json.dump(stats, f, indent=4)
+    write_json(f"{output_dir}/stats.json", stats)
     
     print(f"Results saved to {output_dir} directory")
     print(f"Satisfaction rate: {satisfaction_rate:.2f}%")
@@ -1,130 +1,144 @@
 import json
+import html
 import matplotlib.pyplot as plt
-import pandas as pd
+from collections import Counter
 import os
 
+try:
+    import orjson
+except ImportError:  # Fall back to the standard library parser
+    orjson = None
+
+def load_json(path):
+    """Parse a JSON file, with orjson when it is installed"""
+    if orjson is not None:
+        with open(path, 'rb') as f:
+            return orjson.loads(f.read())
+    with open(path, 'r') as f:
+        return json.load(f)
+
 def load_schedule_data(directory='simple_output'):
     """Load schedule data from JSON files"""
-    # Load student schedules
-    with open(f"{directory}/student_schedules.json", 'r') as f:
-        student_schedules = json.load(f)
+    student_schedules = load_json(f"{directory}/student_schedules.json")
+    teacher_schedules = load_json(f"{directory}/teacher_schedules.json")
+    stats = load_json(f"{directory}/stats.json")
     
-    # Load teacher schedules
-    with open(f"{directory}/teacher_schedules.json", 'r') as f:
-        teacher_schedules = json.load(f)
+    # Course codes per student and block; derive them for outputs written
+    # before the scheduler saved them
+    if os.path.exists(f"{directory}/student_courses.json"):
+        student_courses = load_json(f"{directory}/student_courses.json")
+    else:
+        student_courses = {
+            student: {block: course_info.split(' ')[0] for block, course_info in schedule.items()}
+            for student, schedule in student_schedules.items()
+        }
     
-    # Load stats
-    with open(f"{directory}/stats.json", 'r') as f:
-        stats = json.load(f)
+    return student_schedules, teacher_schedules, stats, student_courses
+
+def compute_aggregates(student_courses):
+    """Count classes per block and enrollments per course in one pass over the schedules"""
+    block_counts = Counter()
+    course_enrollments = Counter()
+    for courses in student_courses.values():
+        block_counts.update(courses.keys())
+        course_enrollments.update(courses.values())
     
-    return student_schedules, teacher_schedules, stats
+    sorted_blocks = sorted(block_counts)
+    return block_counts, course_enrollments, sorted_blocks
 
-def create_block_distribution_chart(student_schedules, output_dir='visualizations'):
+def chart_axes(ax, figsize):
+    """Clear and resize a shared Axes for the next chart, or create one if none is given"""
+    if ax is None:
+        _, ax = plt.subplots(figsize=figsize)
+    else:
+        ax.clear()
+        ax.figure.set_size_inches(figsize)
+    return ax
+
+def save_chart(ax, path, shared):
+    """Save the chart drawn on ax, closing its figure unless it is shared"""
+    ax.figure.tight_layout()
+    ax.figure.savefig(path)
+    if not shared:
+        plt.close(ax.figure)
+
+def create_block_distribution_chart(block_counts, sorted_blocks, output_dir='visualizations', ax=None):
     """Create a bar chart showing class distribution by block"""
     os.makedirs(output_dir, exist_ok=True)
     
-    # Count courses per block
-    block_counts = {}
-    for student, schedule in student_schedules.items():
-        for block in schedule:
-            if block not in block_counts:
-                block_counts[block] = 0
-            block_counts[block] += 1
-    
-    # Sort blocks
-    sorted_blocks = sorted(block_counts.keys())
     counts = [block_counts[block] for block in sorted_blocks]
     
     # Create chart
-    plt.figure(figsize=(10, 6))
-    plt.bar(sorted_blocks, counts)
-    plt.title('Student Class Distribution by Block')
-    plt.xlabel('Block')
-    plt.ylabel('Number of Students')
-    plt.xticks(rotation=0)
-    plt.grid(axis='y', linestyle='--', alpha=0.7)
+    shared = ax is not None
+    ax = chart_axes(ax, (10, 6))
+    bars = ax.bar(sorted_blocks, counts)
+    ax.set_title('Student Class Distribution by Block')
+    ax.set_xlabel('Block')
+    ax.set_ylabel('Number of Students')
+    ax.tick_params(axis='x', labelrotation=0)
+    ax.grid(axis='y', linestyle='--', alpha=0.7)
     
     # Add count labels
-    for i, count in enumerate(counts):
-        plt.text(i, count + 5, str(count), ha='center')
+    ax.bar_label(bars, padding=3)
     
     # Save chart
-    plt.tight_layout()
-    plt.savefig(f"{output_dir}/block_distribution.png")
-    plt.close()
-    
-    return block_counts
+    save_chart(ax, f"{output_dir}/block_distribution.png", shared)
 
-def create_course_enrollment_chart(student_schedules, output_dir='visualizations'):
+def create_course_enrollment_chart(course_enrollments, output_dir='visualizations', ax=None):
     """Create a bar chart showing enrollment by course"""
-    # Count enrollment by course
-    course_enrollments = {}
-    for student, schedule in student_schedules.items():
-        for block, course_info in schedule.items():
-            course_code = course_info.split(' ')[0]
-            if course_code not in course_enrollments:
-                course_enrollments[course_code] = 0
-            course_enrollments[course_code] += 1
-    
-    # Sort courses by enrollment
-    sorted_courses = sorted(course_enrollments.items(), key=lambda x: x[1], reverse=True)
-    
-    # Only show top 20 courses
-    top_courses = sorted_courses[:20]
+    # Only show top 20 courses by enrollment
+    top_courses = course_enrollments.most_common(20)
     courses = [c[0] for c in top_courses]
     enrollments = [c[1] for c in top_courses]
     
     # Create chart
-    plt.figure(figsize=(12, 7))
-    bars = plt.bar(courses, enrollments)
-    plt.title('Top 20 Courses by Enrollment')
-    plt.xlabel('Course')
-    plt.ylabel('Number of Students')
-    plt.xticks(rotation=45, ha='right')
-    plt.grid(axis='y', linestyle='--', alpha=0.7)
+    shared = ax is not None
+    ax = chart_axes(ax, (12, 7))
+    bars = ax.bar(courses, enrollments)
+    ax.set_title('Top 20 Courses by Enrollment')
+    ax.set_xlabel('Course')
+    ax.set_ylabel('Number of Students')
+    plt.setp(ax.get_xticklabels(), rotation=45, ha='right')
+    ax.grid(axis='y', linestyle='--', alpha=0.7)
     
     # Add enrollment labels
-    for bar in bars:
-        plt.text(
-            bar.get_x() + bar.get_width()/2, 
-            bar.get_height() + 1, 
-            str(int(bar.get_height())), 
-            ha='center'
-        )
+    ax.bar_label(bars, padding=3)
     
     # Save chart
-    plt.tight_layout()
-    plt.savefig(f"{output_dir}/course_enrollment.png")
-    plt.close()
-    
-    return course_enrollments
+    save_chart(ax, f"{output_dir}/course_enrollment.png", shared)
 
-def create_student_schedule_table(student_schedules, output_dir='visualizations'):
+def create_student_schedule_table(student_schedules, sorted_blocks, output_dir='visualizations'):
     """Create an HTML table showing sample student schedules"""
-    # Get all blocks
-    all_blocks = set()
-    for student, schedule in student_schedules.items():
-        all_blocks.update(schedule.keys())
-    sorted_blocks = sorted(all_blocks)
-    
     # Sample 10 students
     sample_students = list(student_schedules.keys())[:10]
     
-    # Create a DataFrame for easier display
-    data = []
-    for student in sample_students:
-        row = {'Student ID': student}
-        schedule = student_schedules[student]
-        for block in sorted_blocks:
-            row[block] = schedule.get(block, '')
-        data.append(row)
-    
-    df = pd.DataFrame(data)
+    # Build the table in the same layout as DataFrame.to_html(index=False)
+    header_html = ''.join(f"      <th>{html.escape(str(column), quote=False)}</th>\n" for column in ['Student ID'] + sorted_blocks)
+    rows_html = ''.join(
+        "    <tr>\n"
+        + ''.join(
+            f"      <td>{html.escape(str(value), quote=False)}</td>\n"
+            for value in [student] + [student_schedules[student].get(block, '') for block in sorted_blocks]
+        )
+        + "    </tr>\n"
+        for student in sample_students
+    )
+    html_table = (
+        '<table border="1" class="dataframe">\n'
+        '  <thead>\n'
+        '    <tr style="text-align: right;">\n'
+        f'{header_html}'
+        '    </tr>\n'
+        '  </thead>\n'
+        '  <tbody>\n'
+        f'{rows_html}'
+        '  </tbody>\n'
+        '</table>'
+    )
     
     # Save as HTML
-    html_table = df.to_html(index=False)
-    with open(f"{output_dir}/student_schedules.html", 'w') as f:
-        f.write("""
+    page = ''.join([
+        """
         <!DOCTYPE html>
         <html>
         <head>
@@ -140,21 +154,25 @@ def create_student_schedule_table(student_schedules, output_dir='visualizations'
         </head>
         <body>
             <h1>Sample Student Schedules</h1>
-        """)
-        f.write(html_table)
-        f.write("""
+        """,
+        html_table,
+        """
         </body>
         </html>
-        """)
+        """
+    ])
+    with open(f"{output_dir}/student_schedules.html", 'w') as f:
+        f.write(page)
 
-def create_satisfaction_chart(stats, output_dir='visualizations'):
+def create_satisfaction_chart(stats, output_dir='visualizations', ax=None):
     """Create a pie chart showing request satisfaction rate"""
     resolved = stats['resolved_requests']
     unresolved = stats['unresolved_requests']
     
     # Create chart
-    plt.figure(figsize=(8, 8))
-    plt.pie(
+    shared = ax is not None
+    ax = chart_axes(ax, (8, 8))
+    ax.pie(
         [resolved, unresolved], 
         labels=['Resolved', 'Unresolved'], 
         autopct='%1.1f%%',
@@ -163,18 +181,16 @@ def create_satisfaction_chart(stats, output_dir='visualizations'):
         shadow=True,
         startangle=90
     )
-    plt.title('Request Resolution Rate')
-    plt.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle
+    ax.set_title('Request Resolution Rate')
+    ax.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle
     
     # Save chart
-    plt.tight_layout()
-    plt.savefig(f"{output_dir}/satisfaction_rate.png")
-    plt.close()
+    save_chart(ax, f"{output_dir}/satisfaction_rate.png", shared)
 
 def create_summary_dashboard(stats, block_counts, output_dir='visualizations'):
     """Create a summary dashboard HTML page"""
-    with open(f"{output_dir}/dashboard.html", 'w') as f:
-        f.write("""
+    page = ''.join([
+        """
         <!DOCTYPE html>
         <html>
         <head>
@@ -203,27 +219,27 @@ def create_summary_dashboard(stats, block_counts, output_dir='visualizations'):
             <div class="dashboard">
                 <div class="metric-card">
                     <h3>Satisfaction Rate</h3>
-                    <div class="stat">""")
-        f.write(f"{stats['satisfaction_rate']:.2f}%")
-        f.write("""</div>
+                    <div class="stat">""",
+        f"{stats['satisfaction_rate']:.2f}%",
+        """</div>
                 </div>
                 <div class="metric-card">
                     <h3>Total Requests</h3>
-                    <div class="stat">""")
-        f.write(f"{stats['total_requests']}")
-        f.write("""</div>
+                    <div class="stat">""",
+        f"{stats['total_requests']}",
+        """</div>
                 </div>
                 <div class="metric-card">
                     <h3>Students Scheduled</h3>
-                    <div class="stat">""")
-        f.write(f"{stats['students_scheduled']}")
-        f.write("""</div>
+                    <div class="stat">""",
+        f"{stats['students_scheduled']}",
+        """</div>
                 </div>
                 <div class="metric-card">
                     <h3>Teachers Scheduled</h3>
-                    <div class="stat">""")
-        f.write(f"{stats['teachers_scheduled']}")
-        f.write("""</div>
+                    <div class="stat">""",
+        f"{stats['teachers_scheduled']}",
+        """</div>
                 </div>
             </div>
             
@@ -248,7 +264,10 @@ def create_summary_dashboard(stats, block_counts, output_dir='visualizations'):
             
         </body>
         </html>
-        """)
+        """
+    ])
+    with open(f"{output_dir}/dashboard.html", 'w') as f:
+        f.write(page)
 
 def main():
     """Main function to create visualizations"""
@@ -259,13 +278,18 @@ def main():
     os.makedirs(output_dir, exist_ok=True)
     
     # Load data
-    student_schedules, teacher_schedules, stats = load_schedule_data()
+    student_schedules, teacher_schedules, stats, student_courses = load_schedule_data()
+    
+    # Aggregate the student schedules once for all charts
+    block_counts, course_enrollments, sorted_blocks = compute_aggregates(student_courses)
     
-    # Create visualizations
-    block_counts = create_block_distribution_chart(student_schedules, output_dir)
-    create_course_enrollment_chart(student_schedules, output_dir)
-    create_student_schedule_table(student_schedules, output_dir)
-    create_satisfaction_chart(stats, output_dir)
+    # Create visualizations, drawing every chart on one shared figure
+    fig, ax = plt.subplots()
+    create_block_distribution_chart(block_counts, sorted_blocks, output_dir, ax=ax)
+    create_course_enrollment_chart(course_enrollments, output_dir, ax=ax)
+    create_satisfaction_chart(stats, output_dir, ax=ax)
+    plt.close(fig)
+    create_student_schedule_table(student_schedules, sorted_blocks, output_dir)
     create_summary_dashboard(stats, block_counts, output_dir)
     
     print(f"Visualizations created in {output_dir} directory")